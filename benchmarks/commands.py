@@ -0,0 +1,84 @@
+"""Microbenchmark of per-command dispatch overhead in Processor.eval.
+
+Compares the precompiled command path against the previous per-invocation
+inspect.signature decoding, and times Processor construction.
+
+Usage: python benchmarks/commands.py [--number N]
+"""
+
+import argparse
+import inspect
+import roax.context
+import roax.schema as s
+import timeit
+import vokiz.resource
+
+from vokiz.processor import cmd, Error, Processor
+
+
+def legacy_decode(wrapped, args):
+    """Decode arguments the way the cmd wrapper did before precompilation."""
+    args = list(args)
+    _args = []
+    _kwargs = {}
+    for name, param in inspect.signature(wrapped).parameters.items():
+        if not args:
+            break
+        elif param.kind == param.POSITIONAL_OR_KEYWORD:
+            arg = args.pop(0)
+            try:
+                _args.append(
+                    wrapped.__annotations__.get(name, cmd._str).str_decode(arg)
+                )
+            except s.SchemaError:
+                raise Error(f"Invalid {name}: {arg}.")
+        elif param.kind == param.VAR_KEYWORD:
+            for arg in args:
+                key, value = arg.split("=", 1)
+                _kwargs[key] = value
+            args.clear()
+    return _args, _kwargs
+
+
+def channel():
+    """Return a small synthetic channel."""
+    ch = vokiz.resource.Channel("bench")
+    for n in range(10):
+        ch.users.append(vokiz.resource.User(f"user{n}", op=n == 0))
+        ch.phones.append(vokiz.resource.Phone(f"+1555000{n:04}", f"user{n}"))
+    return ch
+
+
+def report(label, seconds, number):
+    print(f"{label:<32} {seconds / number * 1e6:9.2f} µs/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    number = parser.parse_args().number
+    ch = channel()
+    processor = Processor(ch)
+    add = processor.commands["add"]
+    user = vokiz.resource.User("user0", op=True)
+    report("Processor()", timeit.timeit(lambda: Processor(ch), number=number), number)
+    argv = ["+15550009999", "newbie"]
+    command = add.__func__._command
+    report(
+        "decode add (legacy)",
+        timeit.timeit(lambda: legacy_decode(add.__wrapped__, argv), number=number),
+        number,
+    )
+    report(
+        "decode add (compiled)",
+        timeit.timeit(lambda: command._decode(argv), number=number),
+        number,
+    )
+    with roax.context.push(context="user", user=user):
+        for line in ("/ping", "/who", "/help", "/help who"):
+            seconds = timeit.timeit(lambda: processor.eval(line), number=number)
+            report(f"eval {line}", seconds, number)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Memory benchmark of channel membership representations.
+
+Compares the memory and construction time of membership records held with slots
+against the previous dataclasses with a per-instance __dict__, at configurable
+channel sizes.
+
+Usage: python benchmarks/memory.py [--sizes 1000,10000,100000]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+import vokiz.resource
+
+from dataclasses import dataclass
+
+
+class _LegacyTracked:
+    """Change tracking as previously implemented, in the instance __dict__."""
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        super().__setattr__("_changed", True)
+
+
+@dataclass
+class LegacyPhone(_LegacyTracked):
+    """Phone as previously represented, with a per-instance __dict__."""
+
+    number: str
+    nick: str
+    mute: bool = False
+
+
+@dataclass
+class LegacyUser(_LegacyTracked):
+    """User as previously represented, with a per-instance __dict__."""
+
+    nick: str
+    voice: bool = True
+    op: bool = False
+
+
+def members(size):
+    """Return member rows as decoded from storage, with distinct strings."""
+    return [(f"+1{5550000000 + n}", f"user{n}", f"user{n}") for n in range(size)]
+
+
+def build(rows, phone, user):
+    """Return (phones, users) lists built from member rows."""
+    return [phone(n, k) for n, k, _ in rows], [user(k) for _, _, k in rows]
+
+
+def measure(rows, phone, user):
+    """Return (bytes allocated, seconds) to build membership from rows."""
+    gc.collect()
+    start = time.perf_counter()
+    build(rows, phone, user)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows, phone, user)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    args = parser.parse_args()
+    print(f"{'representation':<16} {'size':>7} {'MiB':>9} {'B/member':>9} {'ms':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        rows = members(size)
+        for name, phone, user in (
+            ("dict", LegacyPhone, LegacyUser),
+            ("slots", vokiz.resource.Phone, vokiz.resource.User),
+        ):
+            allocated, elapsed = measure(rows, phone, user)
+            print(
+                f"{name:<16} {size:>7} {allocated / 2**20:>9.2f} "
+                f"{allocated / size:>9.0f} {elapsed * 1000:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
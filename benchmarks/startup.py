@@ -0,0 +1,71 @@
+"""Startup-time regression check for the command line module.
+
+Imports vokiz.cli under python -X importtime, reports the cumulative import time
+and the slowest modules, and fails if modules that only some commands need are
+imported at startup, or if the import time exceeds an optional budget.
+
+Usage: python benchmarks/startup.py [--budget MS] [--top N]
+"""
+
+import argparse
+import subprocess
+import sys
+
+# modules that must only be imported by the commands that need them
+_lazy = (
+    "readline",
+    "requests",
+    "sqlite3",
+    "vokiz.backends",
+    "vokiz.daemon",
+    "vokiz.journal",
+    "vokiz.outbox",
+    "vokiz.processor",
+    "vokiz.sqlite",
+    "vokiz.webhook",
+)
+
+
+def importtime(module):
+    """Return list of (module, self µs, cumulative µs) for importing module."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stderr
+    result = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self, cumulative, name = line[len("import time:") :].split("|")
+        if not self.strip().isdigit():
+            continue  # header
+        result.append((name.strip(), int(self), int(cumulative)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, help="Maximum import time (ms).")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    times = importtime("vokiz.cli")
+    total = next(c for n, s, c in times if n == "vokiz.cli") / 1000
+    for name, self, cumulative in sorted(times, key=lambda t: -t[1])[: args.top]:
+        print(f"{name:<40} {self / 1000:8.2f} ms {cumulative / 1000:8.2f} ms")
+    print(f"{'vokiz.cli (cumulative)':<40} {total:8.2f} ms")
+    failures = []
+    imported = {name for name, _, _ in times}
+    for name in _lazy:
+        if name in imported:
+            failures.append(f"{name} imported at startup")
+    if args.budget is not None and total > args.budget:
+        failures.append(f"import time {total:.2f} ms exceeds {args.budget:.2f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Benchmark suite for processor hot paths at realistic channel sizes.
+
+Generates synthetic channels and reports throughput and latency percentiles for
+DataclassMapping lookups, cmd argument decoding, Processor.eval, recipient
+resolution, broadcast sends through a recording backend with configurable
+latency, and channel load/save through the channels resource.
+
+Usage: python benchmarks/suite.py [--sizes 100,1000,10000,100000] [--latency MS]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import roax.context
+import tempfile
+import time
+import vokiz.config
+import vokiz.processor
+import vokiz.resource
+import vokiz.sqlite
+
+from vokiz.resource import Channel, Phone, User
+
+
+class Recorder:
+    """Stand-in backend that records sent messages, with simulated latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sent = []
+
+    def receive(self):
+        return ()
+
+    def send(self, number, message):
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent.append((number, message))
+
+
+def channel(size, ops=10):
+    """Return synthetic channel with size phones, one user per phone."""
+    result = Channel(f"bench{size}")
+    for n in range(size):
+        nick = f"user{n}"
+        result.users.append(User(nick, op=n < ops))
+        result.phones.append(Phone(f"+1{5550000000 + n}", nick))
+    return result
+
+
+def measure(function, samples):
+    """Call function samples times, returning list of latencies in seconds."""
+    result = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(samples):
+            start = time.perf_counter()
+            function()
+            result.append(time.perf_counter() - start)
+    return result
+
+
+def report(name, size, latencies, ops=1):
+    """Print throughput and latency percentiles; ops is operations per sample."""
+    latencies = sorted(latencies)
+    total = sum(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6
+
+    rate = len(latencies) * ops / total if total else float("inf")
+    print(
+        f"{name:<24} {size:>7} {rate:>12.1f}/s "
+        f"{pct(0.5):>10.1f} {pct(0.9):>10.1f} {pct(0.99):>10.1f}"
+    )
+
+
+def bench(size, samples, latency, storage, dir):
+    ch = channel(size)
+    processor = vokiz.processor.Processor(ch)
+    recorder = Recorder(latency)
+    processor.backend = recorder
+    op = ch.users[0]
+    numbers = [p.number for p in ch.phones]
+    nicks = [u.nick.upper() for u in ch.users]
+
+    report(
+        "phones[number]",
+        size,
+        measure(lambda: processor.phones[random.choice(numbers)], samples),
+    )
+    report(
+        "users[nick]",
+        size,
+        measure(lambda: processor.users[random.choice(nicks)], samples),
+    )
+    add = processor.commands["add"].__func__._command
+    report(
+        "cmd decode add",
+        size,
+        measure(lambda: add._decode(["+15559999999", "newbie"]), samples),
+    )
+    report("_resolve all", size, measure(lambda: processor._resolve("all"), samples))
+    report("_resolve ops", size, measure(lambda: processor._resolve("ops"), samples))
+    with roax.context.push(context="user", user=op):
+        for line in ("/ping", "/who", "@user1 hello"):
+            report(f"eval {line}", size, measure(lambda: processor.eval(line), samples))
+        broadcasts = max(1, min(samples, 100_000 // size))
+        report(
+            "send all (per phone)",
+            size,
+            measure(lambda: processor.send("all", "hello"), broadcasts),
+            ops=size,
+        )
+
+    if storage == "sqlite":
+        channels = vokiz.sqlite.Channels(f"{dir}/bench.db")
+    else:
+        vokiz.config.config.channel_dir = f"{dir}/channels"
+        channels = vokiz.resource.Channels("file")
+    channels.create(ch.id, ch)
+    io = max(1, min(samples, 1_000_000 // size))
+    report(f"{storage} read", size, measure(lambda: channels.read(ch.id), io))
+
+    def save():
+        ch.phones[0].mute = not ch.phones[0].mute  # one changed member
+        channels.update(ch.id, ch)
+
+    report(f"{storage} update", size, measure(save, io))
+    channels.delete(ch.id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Send latency (ms).")
+    parser.add_argument("--storage", choices=("file", "sqlite"), default="file")
+    args = parser.parse_args()
+    vokiz.config.init()
+    print(
+        f"{'benchmark':<24} {'size':>7} {'throughput':>14} {'p50 µs':>10} "
+        f"{'p90 µs':>10} {'p99 µs':>10}"
+    )
+    with tempfile.TemporaryDirectory() as dir:
+        for size in [int(s) for s in args.sizes.split(",")]:
+            bench(size, args.samples, args.latency / 1000, args.storage, dir)
+
+
+if __name__ == "__main__":
+    main()
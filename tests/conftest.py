@@ -0,0 +1,50 @@
+"""Shared fixtures for Vokiz tests."""
+
+import pytest
+import types
+import vokiz.cli
+import vokiz.config
+import vokiz.daemon
+import vokiz.resource
+import vokiz.webhook
+
+from vokiz.resource import Channel, Phone, User
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Configuration with all files in a temporary directory."""
+    vokiz.config.config = vokiz.config.Config(
+        channel_dir=str(tmp_path / "channels"),
+        database=str(tmp_path / "vokiz.db"),
+        outbox_file=str(tmp_path / "outbox.db"),
+        journal_file=str(tmp_path / "journal.db"),
+        metrics_file=str(tmp_path / "metrics.prom"),
+    )
+    return vokiz.config.config
+
+
+@pytest.fixture
+def channels(config, monkeypatch):
+    """Channels resource in the temporary channel directory."""
+    result = vokiz.resource.Channels()
+    resources = types.SimpleNamespace(channels=result)
+    for module in (vokiz.resource, vokiz.cli, vokiz.daemon, vokiz.webhook):
+        monkeypatch.setattr(module, "resources", resources)
+    return result
+
+
+@pytest.fixture
+def channel():
+    """Channel with an operator and two users."""
+    result = Channel("test")
+    result.users.extend([User("alice", op=True), User("bob"), User("carol")])
+    result.phones.extend(
+        [
+            Phone("+15550000001", "alice"),
+            Phone("+15550000002", "bob"),
+            Phone("+15550000003", "carol"),
+            Phone("+15550000004", "carol"),
+        ]
+    )
+    return result
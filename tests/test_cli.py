@@ -0,0 +1,60 @@
+"""Tests of command line commands."""
+
+import pytest
+import vokiz.backends.none
+import vokiz.cli
+
+from vokiz.backends import Message
+from vokiz.resource import Channel, Phone, User
+
+
+def test_process_routes_shared_backend(channels, channel, monkeypatch):
+    other = Channel("other")
+    other.users.extend([User("dave"), User("erin")])
+    other.phones.extend([Phone("+15550000005", "dave"), Phone("+15550000006", "erin")])
+    channels.create(channel.id, channel)
+    channels.create(other.id, other)
+    incoming = [
+        Message("+15550000001", "@all hello test", "1"),
+        Message("+15550000005", "@all hello other", "2"),
+    ]
+    received = []
+    sent = []
+
+    def receive(self):
+        received.append(self)
+        return iter(incoming if len(received) == 1 else ())
+
+    monkeypatch.setattr(vokiz.backends.none.SMS, "receive", receive)
+    monkeypatch.setattr(
+        vokiz.backends.none.SMS, "send", lambda self, n, m: sent.append((n, m))
+    )
+    vokiz.cli.process.callback(channels=("test",), all_=False, workers=2)
+    assert len(received) == 1  # single receive for channels sharing the backend
+    recipients = {}
+    for number, message in sent:
+        recipients.setdefault(message.split(": ", 1)[1], set()).add(number)
+    test = {"+15550000001", "+15550000002", "+15550000003", "+15550000004"}
+    assert recipients["hello test"] == test
+    assert recipients["hello other"] == {"+15550000005", "+15550000006"}
+
+
+def test_process_isolates_unreadable_channel(channels, channel, monkeypatch, capsys):
+    channels.create(channel.id, channel)
+    with open(channels._path("corrupt"), "w") as file:
+        file.write("{not json")
+    with monkeypatch.context() as m:
+        m.setattr(channels, "read", lambda id: pytest.fail("channel decoded"))
+        ids, errors = vokiz.cli._sharing(["test"])
+    assert ids == ["test"] and "corrupt" in errors
+    vokiz.cli.process.callback(channels=("test",), all_=False, workers=1)
+    assert "Processed channel: test" in capsys.readouterr().out
+
+
+def test_sqlite_backend(tmp_path, channel):
+    import vokiz.sqlite
+
+    channel.backend.kwargs = {"did": "5550009999"}
+    store = vokiz.sqlite.Channels(str(tmp_path / "vokiz.db"))
+    store.create(channel.id, channel)
+    assert store.backend(channel.id).kwargs == {"did": "5550009999"}
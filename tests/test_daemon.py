@@ -0,0 +1,82 @@
+"""Tests of the channel polling daemon."""
+
+import pytest
+import threading
+import time
+import vokiz.backends.none
+import vokiz.daemon
+import vokiz.router
+
+from vokiz.backends import Message
+from vokiz.resource import Channel, Phone, User
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_poll_routes_shared_backend(channels, channel, monkeypatch, asynchronous):
+    other = Channel("other")
+    other.users.extend([User("dave"), User("erin")])
+    other.phones.extend([Phone("+15550000005", "dave"), Phone("+15550000006", "erin")])
+    channels.create(channel.id, channel)
+    channels.create(other.id, other)
+    incoming = [
+        Message("+15550000001", "@all hello test", "1"),
+        Message("+15550000005", "@all hello other", "2"),
+        Message("+15550000001", "/op bob", "3"),
+    ]
+    sent = []
+    monkeypatch.setattr(vokiz.backends.none.SMS, "receive", lambda self: incoming)
+    monkeypatch.setattr(
+        vokiz.backends.none.SMS, "send", lambda self, n, m: sent.append((n, m))
+    )
+    daemon = vokiz.daemon.Daemon(asynchronous=asynchronous)
+    daemon.poll()
+    recipients = {}
+    for number, message in sent:
+        recipients.setdefault(message.split(": ", 1)[-1], set()).add(number)
+    test = {"+15550000001", "+15550000002", "+15550000003", "+15550000004"}
+    assert recipients["hello test"] == test
+    assert recipients["hello other"] == {"+15550000005", "+15550000006"}
+    assert channels.read("test").users[1].op  # changed channel persisted
+    daemon.poll()  # messages handled already are not handled again
+    assert len(sent) == sum(len(r) for r in recipients.values())
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_poll_acks_after_sends(channels, channel, monkeypatch, asynchronous):
+    channels.create(channel.id, channel)
+    events = []
+
+    def send(self, number, message):
+        time.sleep(0.01)
+        events.append("send")
+
+    monkeypatch.setattr(
+        vokiz.backends.none.SMS,
+        "receive",
+        lambda self: [Message("+15550000001", "@all hello", "1")],
+    )
+    monkeypatch.setattr(vokiz.backends.none.SMS, "send", send)
+    monkeypatch.setattr(
+        vokiz.backends.none.SMS, "ack", lambda self, ids: events.append("ack"), False
+    )
+    vokiz.daemon.Daemon(asynchronous=asynchronous).poll()
+    assert events == ["send"] * 4 + ["ack"]
+
+
+def test_poll_async_dispatches_off_loop(channels, channel, monkeypatch):
+    channels.create(channel.id, channel)
+    threads = []
+    dispatch = vokiz.router.Router._dispatch
+
+    def record(self, *args):
+        threads.append(threading.current_thread())
+        return dispatch(self, *args)
+
+    monkeypatch.setattr(vokiz.router.Router, "_dispatch", record)
+    monkeypatch.setattr(
+        vokiz.backends.none.SMS,
+        "receive",
+        lambda self: [Message("+15550000001", "@all hello", "1")],
+    )
+    vokiz.daemon.Daemon(asynchronous=True).poll()
+    assert threads and threading.main_thread() not in threads
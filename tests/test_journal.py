@@ -0,0 +1,60 @@
+"""Tests of the inbound message journal."""
+
+import sqlite3
+import threading
+import vokiz.journal
+
+
+def test_flush_writes_records(tmp_path):
+    journal = vokiz.journal.Journal(str(tmp_path / "journal.db"))
+    journal.record("source", 1)
+    assert journal.handled("source", 1)
+    assert not vokiz.journal.Journal(journal.file).handled("source", 1)
+    journal.flush()
+    assert vokiz.journal.Journal(journal.file).handled("source", 1)
+
+
+def test_record_does_not_lock(tmp_path):
+    journal = vokiz.journal.Journal(str(tmp_path / "journal.db"))
+    for id in range(100):
+        journal.record("a", id)  # unflushed, as mid-batch in another channel
+    errors = []
+
+    def other():
+        try:
+            c = sqlite3.connect(journal.file, timeout=0)
+            with c:
+                c.execute("INSERT INTO handled VALUES ('b', '1', 0)")
+        except sqlite3.OperationalError as oe:
+            errors.append(oe)
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    assert not errors
+    journal.flush()
+    assert journal.handled("a", 99) and journal.handled("b", 1)
+
+
+class Backend:
+    def __init__(self, ids):
+        self.ids = ids
+        self.acked = []
+
+    def receive(self):
+        for id in self.ids:
+            yield type("Message", (), {"id": id})()
+
+    def ack(self, ids):
+        self.acked.extend(ids)
+
+
+def test_receive_skips_handled(tmp_path):
+    journal = vokiz.journal.Journal(str(tmp_path / "journal.db"))
+    journal.record("s", "1")
+    journal.flush()
+    backend = Backend(["1", "2", "3"])
+    received = [m.id for m in vokiz.journal.receive(backend, journal, "s", batch=2)]
+    assert received == ["2", "3"]
+    assert backend.acked == ["1", "2", "3"]
+    assert journal.handled("s", "3")
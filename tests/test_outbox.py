@@ -0,0 +1,89 @@
+"""Tests of the durable outbound message queue."""
+
+import pytest
+import time
+import vokiz.backends
+import vokiz.outbox
+import vokiz.scheduler
+
+
+class Backend:
+    """Backend that records sends, failing if set to."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+        self.during = None  # called with each send, before it is made
+
+    def send(self, number, message):
+        if self.during:
+            self.during()
+        if self.fail:
+            raise vokiz.backends.BackendError("unavailable")
+        self.sent.append((number, message))
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return vokiz.outbox.Outbox(str(tmp_path / "outbox.db"), attempts=3, backoff=10.0)
+
+
+def test_drain_sends_and_removes(outbox):
+    backend = Backend()
+    outbox.put("test", "+15550000001", "hello")
+    assert outbox.drain(lambda channel: backend) == (1, 0)
+    assert backend.sent == [("+15550000001", "hello")]
+    assert outbox.entries() == []
+
+
+def test_lease_excludes_concurrent_drain(outbox):
+    backend = Backend()
+    nested = []
+    backend.during = lambda: nested.append(outbox.drain(lambda channel: backend))
+    outbox.put("test", "+15550000001", "hello")
+    assert outbox.drain(lambda channel: backend) == (1, 0)
+    assert nested == [(0, 0)]  # message claimed by the outer drain
+    assert len(backend.sent) == 1
+
+
+def test_expired_lease_reclaimed(tmp_path):
+    outbox = vokiz.outbox.Outbox(str(tmp_path / "outbox.db"), lease=0.0)
+    outbox.put("test", "+15550000001", "hello")
+    assert len(outbox._claim(None, False, 100)) == 1
+    assert len(outbox._claim(None, False, 100)) == 1  # sender presumed dead
+
+
+def test_backoff_doubles(outbox):
+    backend = Backend(fail=True)
+    outbox.put("test", "+15550000001", "hello")
+    assert outbox.drain(lambda channel: backend) == (0, 1)
+    assert outbox.drain(lambda channel: backend) == (0, 0)  # not yet due
+    entry = outbox.entries()[0]
+    assert entry.attempts == 1 and not entry.failed
+    assert entry.due - time.time() == pytest.approx(10.0, abs=1.0)
+    assert outbox.drain(lambda channel: backend, force=True) == (0, 1)
+    entry = outbox.entries()[0]
+    assert entry.attempts == 2
+    assert entry.due - time.time() == pytest.approx(20.0, abs=1.0)
+
+
+def test_failed_after_attempts(outbox):
+    backend = Backend(fail=True)
+    outbox.put("test", "+15550000001", "hello")
+    for _ in range(3):
+        outbox.drain(lambda channel: backend, force=True)
+    entry = outbox.entries()[0]
+    assert entry.failed and entry.attempts == 3 and entry.error == "unavailable"
+    assert outbox.drain(lambda channel: backend, force=True) == (0, 0)
+    assert outbox.retry() == 1
+    backend.fail = False
+    assert outbox.drain(lambda channel: backend) == (1, 0)
+    assert outbox.entries() == []
+
+
+def test_priority_order(outbox):
+    backend = Backend()
+    outbox.put("test", "+15550000001", "broadcast", vokiz.scheduler.BROADCAST)
+    outbox.put("test", "+15550000002", "reply", vokiz.scheduler.REPLY)
+    outbox.drain(lambda channel: backend)
+    assert [m for _, m in backend.sent] == ["reply", "broadcast"]
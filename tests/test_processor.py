@@ -0,0 +1,200 @@
+"""Tests of channel processing."""
+
+import asyncio
+import contextlib
+import pytest
+import roax.context
+import threading
+import time
+import vokiz.backends
+import vokiz.journal
+import vokiz.processor
+import vokiz.resource
+import vokiz.scheduler
+
+
+@pytest.fixture
+def processor(channel):
+    return vokiz.processor.Processor(channel)
+
+
+@contextlib.contextmanager
+def member(processor, number):
+    """Act as the member with number, as when handling a message from it."""
+    phone = processor.phones[number]
+    user = processor.users[phone.nick]
+    with roax.context.push(context="phone", phone=phone):
+        with roax.context.push(context="user", user=user):
+            yield
+
+
+def baseline(processor, nick):
+    """Return numbers of phones a nick resolves to, scanning all phones."""
+    aliases = processor.channel.aliases
+    return [
+        phone.number
+        for phone in processor.channel.phones
+        if nick == aliases.all
+        or phone.nick == nick
+        or (nick == aliases.ops and processor.users[phone.nick].op)
+    ]
+
+
+def check(processor):
+    aliases = processor.channel.aliases
+    nicks = {*processor.users, aliases.all, aliases.ops, "all", "ops", "nobody"}
+    for nick in nicks:
+        resolved = [phone.number for phone in processor._resolve(nick)]
+        assert resolved == baseline(processor, nick), nick
+
+
+@pytest.mark.parametrize(
+    "number, command",
+    [
+        ("+15550000001", "/add +15550000005 dave"),
+        ("+15550000001", "/add +15550000005 bob"),
+        ("+15550000001", "/remove +15550000002"),
+        ("+15550000001", "/remove +15550000003"),
+        ("+15550000001", "/op bob"),
+        ("+15550000001", "/deop alice"),
+        ("+15550000001", "/alias all=everyone"),
+        ("+15550000001", "/alias ops=admins"),
+        ("+15550000002", "/mute"),
+    ],
+)
+def test_resolve_matches_baseline(processor, number, command):
+    check(processor)
+    with member(processor, number):
+        assert not (processor.eval(command) or "").startswith("Error")
+    check(processor)
+
+
+def test_resolve_after_unmute(processor):
+    with member(processor, "+15550000002"):
+        processor.eval("/mute")
+        check(processor)
+        processor.eval("/unmute")
+    check(processor)
+
+
+def test_resolve_after_sequence(processor):
+    with member(processor, "+15550000001"):
+        for command in (
+            "/add +15550000005 dave",
+            "/op dave",
+            "/alias all=everyone",
+            "/remove +15550000001",
+        ):
+            processor.eval(command)
+            check(processor)
+
+
+class Flaky:
+    """Backend that sends with varying delay and fails for some numbers."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def send(self, number, message):
+        time.sleep(0.001 * (int(number[-1]) % 3))
+        if number in self.failing:
+            raise vokiz.backends.BackendError("unavailable")
+        self.sent.append(number)
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_deliver_none_backend(processor, concurrency):
+    processor.channel.backend.concurrency = concurrency
+    processor.phones["+15550000003"].mute = True
+    phones = processor._resolve("all")
+    result = processor._deliver(phones, "hello", vokiz.scheduler.BROADCAST)
+    assert result.sent == ["+15550000001", "+15550000002", "+15550000004"]
+    assert result.muted == ["+15550000003"]
+    assert result.failed == {} and result.queued == []
+    assert result.segments == 1
+
+
+def test_deliver_concurrent_order(processor):
+    processor.channel.backend.concurrency = 4
+    processor.backend = Flaky(failing={"+15550000002"})
+    phones = processor._resolve("all")
+    for _ in range(5):
+        result = processor._deliver(phones, "hello", vokiz.scheduler.BROADCAST)
+        assert result.sent == ["+15550000001", "+15550000003", "+15550000004"]
+        assert result.failed == {"+15550000002": "unavailable"}
+
+
+def test_mapping_finds_renamed_key(processor):
+    assert "carol" in processor.users
+    processor.users["carol"].nick = "renamed"
+    assert "renamed" in processor.users and "RENAMED" in processor.users
+    assert "carol" not in processor.users
+    processor.phones["+15550000002"].number = "+15550000009"
+    assert processor.phones["+15550000009"].nick == "bob"
+    assert "+15550000002" not in processor.phones
+
+
+class Slow:
+    """Backend that receives one broadcast and sends slowly, recording events."""
+
+    def __init__(self):
+        self.events = []
+
+    def receive(self):
+        return iter([vokiz.backends.Message("+15550000001", "@all hello", "1")])
+
+    def ack(self, ids):
+        self.events.append(("ack", ids))
+
+    def send(self, number, message):
+        time.sleep(0.01)
+        self.events.append(("send", number))
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_process_acks_after_sends(processor, tmp_path, asynchronous):
+    processor.backend = Slow()
+    journal = vokiz.journal.Journal(str(tmp_path / "journal.db"))
+    if asynchronous:
+        asyncio.run(processor.process_async(journal=journal))
+    else:
+        processor.process(journal)
+    events = processor.backend.events
+    assert [e[0] for e in events] == ["send"] * 4 + ["ack"]
+
+
+def test_process_async_handles_off_loop(processor, monkeypatch):
+    processor.backend = Slow()
+    handle = processor.handle
+    threads = []
+
+    def record(number, message):
+        threads.append(threading.current_thread())
+        handle(number, message)
+
+    monkeypatch.setattr(processor, "handle", record)
+    asyncio.run(processor.process_async())
+    assert threads and threading.main_thread() not in threads
+    assert [e[0] for e in processor.backend.events].count("send") == 4
+
+
+def test_send_failures_reported_to_op(processor):
+    processor.backend = Flaky(failing={"+15550000002"})
+    with member(processor, "+15550000001"):
+        result = processor.eval("@all hello")
+    assert "Failed: 1 (+15550000002)" in result
+    with member(processor, "+15550000003"):  # not an op
+        assert processor.eval("@all hello") is None
+    processor.backend = Flaky()
+    with member(processor, "+15550000001"):
+        assert processor.eval("@all hello") is None
+
+
+def test_send_summary_in_shell(processor):
+    processor.backend = Flaky(failing={"+15550000003"})
+    user = vokiz.resource.User("alice", True, True)
+    with roax.context.push(context="shell"):
+        with roax.context.push(context="user", user=user):
+            result = processor.eval("@all hello")
+    assert result == "Sent: 3. Queued: 0. Muted: 0. Failed: 1 (+15550000003)."
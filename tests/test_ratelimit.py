@@ -0,0 +1,25 @@
+"""Tests of outbound rate limiting."""
+
+import logging
+import vokiz.metrics
+import vokiz.ratelimit
+
+
+def test_conflicting_limits_share_bucket(caplog):
+    key = ("did", "test", "5550000001")
+    first = vokiz.ratelimit.bucket(key, 1.0, 2)
+    with caplog.at_level(logging.ERROR, logger="vokiz"):
+        second = vokiz.ratelimit.bucket(key, 5.0, 2)
+    assert second is first
+    assert (first.rate, first.burst) == (1.0, 2)
+    assert "Conflicting rate limit" in caplog.text
+
+
+def test_waits_observed():
+    key = ("account", "observed", "user")
+    bucket = vokiz.ratelimit.bucket(key, 100.0, 1)
+    for _ in range(3):
+        bucket.acquire("test")
+    rendered = vokiz.metrics.render()
+    line = 'vokiz_ratelimit_wait_seconds_count{scope="account",backend="observed"} 3'
+    assert line in rendered
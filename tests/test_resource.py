@@ -0,0 +1,102 @@
+"""Tests of channel resources."""
+
+import json
+import os.path
+import vokiz.resource
+import vokiz.sqlite
+
+from vokiz.resource import Phone, User
+
+
+def test_member_change_marks_channel(channel):
+    channel.clean()
+    assert not channel.changed
+    channel.phones[1].mute = True
+    assert channel.changed
+    assert channel.phones[1].changed and not channel.phones[0].changed
+    assert not channel.phones.changed  # list itself not mutated
+
+
+def test_list_mutation_marks_channel(channel):
+    channel.clean()
+    channel.users.append(User("dave"))
+    assert channel.changed and channel.users.changed
+    channel.clean()
+    channel.users[-1].op = True  # added item is linked to channel
+    assert channel.changed
+
+
+def test_nested_change_marks_channel(channel):
+    channel.clean()
+    channel.aliases.all = "everyone"
+    assert channel.changed
+    channel.clean()
+    channel.backend.kwargs = {"did": "5550009999"}
+    assert channel.changed
+
+
+def test_replaced_list_linked(channel):
+    channel.phones = [Phone("+15550000009", "dave")]
+    channel.clean()
+    channel.phones[0].nick = "erin"
+    assert channel.changed
+
+
+def test_copy_linked(channel):
+    channel.clean()
+    copy = channel.copy()
+    assert not copy.changed
+    copy.users[0].voice = False
+    assert copy.changed and not channel.changed
+    copy.clean()
+    copy.phones.extend(iter([Phone("+15550000009", "dave")]))
+    copy.clean()
+    copy.phones[-1].mute = True
+    assert copy.changed
+
+
+def test_channels_configured_storage(config, channel):
+    config.storage = "sqlite"
+    channels = vokiz.resource.resources.channels  # as resolved by roax
+    assert isinstance(channels, vokiz.sqlite.Channels)
+    channels.create(channel.id, channel)
+    assert channels.read(channel.id).users == channel.users
+
+
+def test_channels_specified_storage(config):
+    config.storage = "sqlite"
+    assert isinstance(vokiz.resource.Channels("file"), vokiz.resource.Channels)
+    config.storage = "file"
+    assert isinstance(vokiz.resource.Channels(), vokiz.resource.Channels)
+    assert isinstance(vokiz.resource.Channels("sqlite"), vokiz.sqlite.Channels)
+
+
+def test_renames_counted_by_holder(channel):
+    other = channel.copy()
+    before = vokiz.resource.renames(other.users)
+    channel.users[0].nick = "renamed"
+    channel.phones[0].mute = True  # not a key field
+    assert vokiz.resource.renames(channel.users) == 1
+    assert vokiz.resource.renames(other.users) == before
+    assert vokiz.resource.renames([User("dave")]) == 0
+
+
+def test_cache_returns_copies(channels, channel):
+    channels.create(channel.id, channel)
+    first = channels.read(channel.id)
+    first.users[0].op = False
+    first.phones.append(Phone("+15550000005", "alice"))
+    second = channels.read(channel.id)
+    assert second.users[0].op and len(second.phones) == 4
+    assert not second.changed
+
+
+def test_cache_invalidated_on_file_change(channels, channel):
+    channels.create(channel.id, channel)
+    assert channels.read(channel.id).head == channel.head
+    changed = channel.copy()
+    changed.head = "Changed: "
+    path = os.path.join(channels.dir, f"{channel.id}.json")
+    with open(path, "w") as file:  # as if edited by another process
+        json.dump(vokiz.resource._schema.json_encode(changed), file)
+    assert channels.read(channel.id).head == "Changed: "
@@ -0,0 +1,39 @@
+"""Tests of inbound message routing."""
+
+import types
+import vokiz.journal
+import vokiz.router
+
+from vokiz.resource import Backend
+
+
+def voipms(did, **kwargs):
+    return Backend("voipms", {"username": "user", "did": did, **kwargs})
+
+
+class Processors:
+    def __init__(self, backends):
+        self.backends = backends
+
+    def get(self, id):
+        channel = types.SimpleNamespace(backend=self.backends[id])
+        return types.SimpleNamespace(channel=channel)
+
+
+def test_groups_by_account_and_did():
+    processors = Processors(
+        {
+            "a": voipms("5550000001", token="x", page_size="50"),
+            "b": voipms("5550000001", read_timeout="60"),
+            "c": voipms("5550000002"),
+        }
+    )
+    router = vokiz.router.Router(processors)
+    assert router.groups(["a", "b", "c"]) == [["a", "b"], ["c"]]
+
+
+def test_source_ignores_connection_kwargs():
+    a = vokiz.journal.source(voipms("5550000001", read_timeout="30"))
+    b = vokiz.journal.source(voipms("5550000001", read_timeout="60", token="x"))
+    c = vokiz.journal.source(voipms("5550000002"))
+    assert a == b != c
@@ -0,0 +1,41 @@
+"""Tests of SMS segment encoding."""
+
+import vokiz.segments
+
+from vokiz.segments import compose, segments, transliterate
+
+
+def test_segments():
+    assert segments("") == vokiz.segments.Segments("GSM-7", 0, 0)
+    assert segments("a" * 160).count == 1
+    assert segments("a" * 161).count == 2
+    assert segments("€" * 80) == vokiz.segments.Segments("GSM-7", 160, 1)
+    assert segments("é" * 70).charset == "GSM-7"
+    assert segments("ć" * 70) == vokiz.segments.Segments("UCS-2", 70, 1)
+    assert segments("ć" * 71).count == 2
+
+
+def test_escape_not_split():
+    assert segments("a" * 151 + "€" + "a" * 153).count == 2  # 306 septets
+    assert segments("a" * 152 + "€" + "a" * 152).count == 3
+
+
+def test_transliterate():
+    assert transliterate("“It’s” — fine…") == '"It\'s" - fine...'
+    assert transliterate("Ćao, Łódź") == "Cao, Łodz"  # Ł has no decomposition
+    assert transliterate("héllo") == "héllo"  # é is in GSM-7
+    assert segments(transliterate("naïve ‘quote’")).charset == "GSM-7"
+
+
+def test_compose_first_header_not_adding_segment():
+    headers = ["From alice to all: ", "alice: ", ""]
+    assert compose("hello", headers) == "From alice to all: hello"
+    message = "a" * 150
+    assert compose(message, headers) == f"alice: {message}"
+    message = "a" * 158
+    assert compose(message, headers) == message
+
+
+def test_compose_last_header_if_all_add():
+    message = "a" * 160
+    assert compose(message, ["From alice: ", "a: "]) == f"a: {message}"
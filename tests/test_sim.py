@@ -0,0 +1,19 @@
+"""Tests of the simulated backend."""
+
+import vokiz.journal
+
+from vokiz.backends.sim import SMS
+
+
+def test_backlog_received_first():
+    sms = SMS(rate="0", backlog="5", seed="1")
+    assert len(list(sms.receive())) == 5
+    assert list(sms.receive()) == []
+
+
+def test_ids_unique_across_instances(tmp_path):
+    journal = vokiz.journal.Journal(str(tmp_path / "journal.db"))
+    for _ in range(2):  # as successive vokiz process runs
+        sms = SMS(rate="0", backlog="3", seed="1")
+        received = list(vokiz.journal.receive(sms, journal, "sim"))
+        assert len(received) == 3
@@ -0,0 +1,144 @@
+"""Tests of the VOIP.ms backend against a local stand-in server."""
+
+import http.server
+import json
+import pytest
+import threading
+import urllib.parse
+import vokiz.backends
+
+from vokiz.backends.voipms import SMS
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """Stand-in VOIP.ms API, recording requests and answering from canned state."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.requests = []  # (method, client port)
+        self.statuses = {}  # method: list of statuses to answer with first
+        self.sms = []
+        self.sent = []
+        self.release = threading.Event()  # cleared to hold deletions
+        self.release.set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/"
+
+    def count(self, method):
+        return sum(1 for m, _ in self.requests if m == method)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        method = params["method"]
+        self.server.requests.append((method, self.client_address[1]))
+        statuses = self.server.statuses.get(method)
+        if statuses:
+            return self._respond(statuses.pop(0), {})
+        if method == "getSMS":
+            sms = self.server.sms[: int(params["limit"])]
+            body = {"status": "success", "sms": sms} if sms else {"status": "no_sms"}
+        elif method == "deleteSMS":
+            self.server.release.wait(10)
+            self.server.sms = [s for s in self.server.sms if s["id"] != params["id"]]
+            body = {"status": "success"}
+        elif method == "sendSMS":
+            self.server.sent.append((params["dst"], params["message"]))
+            body = {"status": "success"}
+        else:
+            body = {"status": "success", "ip": "127.0.0.1"}
+        self._respond(200, body)
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def server():
+    result = Server()
+    thread = threading.Thread(target=result.serve_forever, daemon=True)
+    thread.start()
+    yield result
+    result.shutdown()
+    result.server_close()
+
+
+def sms(server, **kwargs):
+    return SMS("user", "pass", "5550009999", url=server.url, backoff="0", **kwargs)
+
+
+def incoming(n):
+    return {"id": str(n), "type": "1", "contact": "5550000001", "message": f"m{n}"}
+
+
+def test_connection_reused(server):
+    backend = sms(server)
+    for n in range(5):
+        backend.send("+15550000002", f"hello {n}")
+    ports = {port for method, port in server.requests if method == "sendSMS"}
+    assert len(ports) == 1
+    assert len(server.sent) == 5
+
+
+def test_idempotent_retried_on_status(server):
+    backend = sms(server)
+    server.statuses["getSMS"] = [502, 503]
+    server.sms = [incoming(1)]
+    assert [m.id for m in backend.receive()] == ["1"]
+    assert server.count("getSMS") == 3  # two failures, then a short page
+
+
+def test_send_not_retried_on_status(server):
+    backend = sms(server)
+    server.statuses["sendSMS"] = [502, 502, 502, 502]
+    with pytest.raises(vokiz.backends.BackendError):
+        backend.send("+15550000002", "once")
+    assert server.count("sendSMS") == 1
+
+
+def test_paging(server):
+    backend = sms(server, page_size="2")
+    server.sms = [incoming(n) for n in range(5)]
+    ids = []
+    for message in backend.receive():
+        ids.append(message.id)
+        backend.ack([message.id])
+    assert ids == ["0", "1", "2", "3", "4"]
+    backend._executor.shutdown()
+    assert server.sms == []
+
+
+def test_ack_does_not_block(server):
+    backend = sms(server)
+    server.sms = [incoming(1)]
+    server.release.clear()
+    for message in backend.receive():
+        backend.ack([message.id])
+    assert len(server.sms) == 1  # deletion still in progress
+    server.release.set()
+    backend._executor.shutdown()
+    assert server.sms == []
+
+
+def test_delete_error_raised_later(server):
+    backend = sms(server)
+    server.sms = [incoming(1)]
+    server.statuses["deleteSMS"] = [404]
+    for message in backend.receive():
+        backend.ack([message.id])
+    backend._executor.shutdown()
+    with pytest.raises(vokiz.backends.BackendError):
+        list(backend.receive())
@@ -0,0 +1,107 @@
+import io
+import pytest
+import threading
+import urllib.parse
+import vokiz.backends.none
+import vokiz.webhook
+import wsgiref.util
+
+from vokiz.resource import Backend
+
+DID = "5550009999"
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def app(channels, channel):
+    channel.backend = Backend(
+        "voipms",
+        {
+            "username": "user",
+            "password": "password",
+            "did": DID,
+            "url": "http://127.0.0.1:9/",  # unreachable; falls back to none backend
+            "retries": "0",
+            "token": TOKEN,
+        },
+    )
+    channels.create(channel.id, channel)
+    return vokiz.webhook.App("voipms")
+
+
+def call(app, **params):
+    body = urllib.parse.urlencode(params).encode()
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+    }
+    wsgiref.util.setup_testing_defaults(environ)
+    result = {}
+
+    def start_response(status, headers):
+        result["status"] = status
+
+    result["body"] = b"".join(app(environ, start_response)).decode()
+    return result["status"]
+
+
+def callback(message, sender="5550000001", **params):
+    return {"to": DID, "from": sender, "message": message, **params}
+
+
+def test_missing_token_forbidden(app, channels):
+    status = call(app, **callback("/add +15550000666 mallory"))
+    assert status.startswith("403")
+    assert "+15550000666" not in [p.number for p in channels.read("test").phones]
+
+
+def test_wrong_token_forbidden(app, channels):
+    status = call(app, **callback("/add +15550000666 mallory", token="guess"))
+    assert status.startswith("403")
+    assert "+15550000666" not in [p.number for p in channels.read("test").phones]
+
+
+def test_token_authorizes_command(app, channels):
+    status = call(app, **callback("/add +15550000666 mallory", token=TOKEN))
+    assert status.startswith("200")
+    assert "+15550000666" in [p.number for p in channels.read("test").phones]
+
+
+def test_channel_without_token_forbidden(app, channels):
+    ch = channels.read("test")
+    del ch.backend.kwargs["token"]
+    channels.update(ch.id, ch)
+    app = vokiz.webhook.App("voipms")
+    assert call(app, **callback("/ping", token="")).startswith("403")
+
+
+def test_unknown_did(app):
+    params = callback("/ping", token=TOKEN)
+    params["to"] = "5550000000"
+    assert call(app, **params).startswith("404")
+
+
+def test_missing_parameter(app):
+    assert call(app, to=DID, token=TOKEN).startswith("400")
+
+
+def test_unregistered_sender_ignored(app, channels):
+    status = call(app, **callback("/ping", sender="5550000777", token=TOKEN))
+    assert status.startswith("200")
+
+
+def test_responds_before_sends(app, monkeypatch):
+    release = threading.Event()
+    sent = []
+
+    def send(self, number, message):
+        release.wait(10)
+        sent.append(number)
+
+    monkeypatch.setattr(vokiz.backends.none.SMS, "send", send)
+    assert call(app, **callback("@all hello", token=TOKEN)).startswith("200")
+    assert sent == []  # sends are held, yet the callback was answered
+    release.set()
+    app.close()
+    assert len(sent) == 4
@@ -1,5 +1,6 @@
 """Vokiz backends module."""
 
+import asyncio
 import importlib
 
 
@@ -7,14 +8,89 @@ class BackendError(Exception):
     """Exception that is raised by a backend."""
 
 
-def load(backend):
-    """Load a backend from a backend configuration dataclass."""
+class Message(tuple):
+    """
+    An incoming (number, message) pair. Backends that require receipt of messages to
+    be acknowledged set id, to be passed to the backend ack method once handled.
+    """
+
+    def __new__(cls, number, message, id=None):
+        result = super().__new__(cls, (number, message))
+        result.id = id
+        return result
+
+
+def _number(kwarg, value, type):
+    """Convert string keyword argument value to a number."""
     try:
-        module = importlib.import_module(f"vokiz.backends.{backend.module}")
+        return type(value)
+    except ValueError:
+        raise BackendError(f"Invalid {kwarg}: {value}")
+
+
+def _module(backend):
+    try:
+        return importlib.import_module(f"vokiz.backends.{backend.module}")
     except ModuleNotFoundError:
         raise BackendError(f"No such backend module: {backend.module}")
+
+
+def _instance(backend, name):
     try:
-        instance = getattr(module, "SMS")(**backend.kwargs)
+        return getattr(_module(backend), name)(**backend.kwargs)
     except TypeError as te:
         raise BackendError(f"Invalid arguments to {backend.module} backend")
-    return instance
+
+
+def key(backend):
+    """
+    Return key identifying the account and number of a backend configuration:
+    its module, username and DID. Other keyword arguments, such as timeouts, do not
+    identify the number; backends without a DID are identified by all of them.
+    """
+    kwargs = backend.kwargs
+    if "did" in kwargs:
+        return (backend.module, kwargs.get("username", ""), kwargs["did"])
+    return (backend.module, *sorted(kwargs.items()))
+
+
+def load(backend):
+    """Load a backend from a backend configuration dataclass."""
+    return _instance(backend, "SMS")
+
+
+class AsyncAdapter:
+    """
+    Adapts a synchronous backend to the asynchronous backend protocol, where
+    receive is an asynchronous iterator and send is a coroutine. Blocking calls are
+    run in an executor.
+    """
+
+    def __init__(self, backend, executor=None):
+        self.backend = backend
+        self.executor = executor
+
+    async def receive(self):
+        """Asynchronously iterate through incoming text messages."""
+        loop = asyncio.get_running_loop()
+        iterator = iter(self.backend.receive())
+        done = object()
+        while True:
+            item = await loop.run_in_executor(self.executor, next, iterator, done)
+            if item is done:
+                break
+            yield item
+
+    async def ack(self, ids):
+        """Acknowledge receipt of handled messages."""
+        ack = getattr(self.backend, "ack", None)
+        if ack:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, ack, ids)
+
+    async def send(self, number, message):
+        """Send outgoing text message."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.backend.send, number, message
+        )
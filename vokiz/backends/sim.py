@@ -0,0 +1,96 @@
+"""Simulated backend module, for load and soak testing."""
+
+import random
+import threading
+import time
+import uuid
+
+from vokiz.backends import _number, BackendError, Message
+
+_commands = ("/ping", "/who", "/help")
+
+
+class SMS:
+    """
+    A simulated short message service. Incoming messages are generated from a set of
+    numbers at a target rate, with a mix of chat and commands; sends incur simulated
+    latency and errors. Messages received and sent are recorded.
+
+    Numbers are a comma-separated list, or count consecutive numbers from first. The
+    rate is messages per second; commands is the fraction of messages that are
+    commands; latency is seconds per send; errors is the fraction of sends that fail.
+
+    Messages are generated from construction, so vokiz serve, which keeps backends
+    loaded, receives a steady stream. Each vokiz process run loads a new backend, so
+    receives only backlog, the number of messages already waiting at construction.
+    Message identifiers are unique to each instance, so are not mistaken in the
+    journal for messages handled by an earlier instance.
+    """
+
+    def __init__(
+        self,
+        numbers="",
+        first="+15550000000",
+        count="10",
+        rate="1",
+        commands="0.2",
+        latency="0",
+        errors="0",
+        backlog="0",
+        seed=None,
+    ):
+        if numbers:
+            self.numbers = [n.strip() for n in numbers.split(",")]
+        else:
+            start = _number("first", first, int)
+            self.numbers = [
+                f"+{start + n}" for n in range(_number("count", count, int))
+            ]
+        self.rate = _number("rate", rate, float)
+        self.commands = _number("commands", commands, float)
+        self.latency = _number("latency", latency, float)
+        self.errors = _number("errors", errors, float)
+        self.backlog = _number("backlog", backlog, int)
+        self.random = random.Random(seed)
+        self.received = []  # (number, message)
+        self.sent = []  # (number, message)
+        self.failed = []  # (number, message)
+        self.acked = []
+        self._lock = threading.Lock()
+        self._generated = 0
+        self._prefix = uuid.uuid4().hex[:12]
+        self._start = time.monotonic()
+
+    def _message(self):
+        """Return a generated incoming message."""
+        self._generated += 1
+        number = self.random.choice(self.numbers)
+        if self.random.random() < self.commands:
+            message = self.random.choice(_commands)
+        else:
+            message = f"Simulated message {self._generated}."
+        return Message(number, message, f"{self._prefix}-{self._generated}")
+
+    def receive(self):
+        """Receive text messages generated since the previous receive."""
+        with self._lock:
+            elapsed = time.monotonic() - self._start
+            due = self.backlog + int(elapsed * self.rate) - self._generated
+            messages = [self._message() for _ in range(max(0, due))]
+            self.received.extend(messages)
+        return iter(messages)
+
+    def ack(self, ids):
+        """Acknowledge receipt of messages."""
+        with self._lock:
+            self.acked.extend(ids)
+
+    def send(self, number, message):
+        """Send outgoing text message, after simulated latency."""
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.random.random() < self.errors:
+                self.failed.append((number, message))
+                raise BackendError("Simulated send error")
+            self.sent.append((number, message))
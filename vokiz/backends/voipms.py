@@ -1,9 +1,14 @@
 """VOIP.ms backend module."""
 
+import concurrent.futures
 import requests
-import urllib.parse
+import requests.adapters
+import threading
+import time
+import urllib3.util.retry
+import vokiz.metrics
 
-from vokiz.backends import BackendError
+from vokiz.backends import _number, BackendError, Message
 
 
 def _e164_to_na(number):
@@ -23,25 +28,115 @@ def _na_to_e164(number):
     return f"+1{number}"
 
 
+def callback(params):
+    """
+    Return (did, number, message) from the parameters of an SMS callback. The
+    callback URL should be configured as:
+    ...?to={TO}&from={FROM}&message={MESSAGE}&token=TOKEN, where TOKEN is the secret
+    configured as the token keyword argument of the channel backend.
+    """
+    try:
+        return params["to"], _na_to_e164(params["from"]), params["message"]
+    except KeyError as ke:
+        raise BackendError(f"Missing callback parameter: {ke}")
+
+
+_request_seconds = vokiz.metrics.histogram(
+    "vokiz_voipms_request_seconds",
+    "Duration of VOIP.ms API requests.",
+    ["method", "status"],
+)
+
+
 class SMS:
     """A VOIP.ms short message service that can send and receive text messages."""
 
     base_url = "https://voip.ms/api/v1/rest.php"
 
-    def __init__(self, username, password, did):
+    def __init__(
+        self,
+        username,
+        password,
+        did,
+        url=base_url,
+        connect_timeout="5",
+        read_timeout="30",
+        retries="3",
+        backoff="0.5",
+        pool_size="10",
+        page_size="100",
+        token=None,  # shared secret authenticating callbacks; see callback
+    ):
         self.username = username
         self.password = password
         self.did = did
+        self.url = url
+        self.timeout = (
+            _number("connect_timeout", connect_timeout, float),
+            _number("read_timeout", read_timeout, float),
+        )
+        retries = _number("retries", retries, int)
+        backoff = _number("backoff", backoff, float)
+        self.pool_size = _number("pool_size", pool_size, int)
+        self.page_size = _number("page_size", page_size, int)
+        self.session = self._session(  # idempotent methods
+            urllib3.util.retry.Retry(
+                total=retries,
+                read=0,
+                backoff_factor=backoff,
+                status_forcelist=(429, 500, 502, 503, 504),
+                raise_on_status=False,
+            )
+        )
+        self._send_session = self._session(  # sendSMS is not idempotent
+            urllib3.util.retry.Retry(
+                total=retries, read=0, status=0, other=0, backoff_factor=backoff
+            )
+        )
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.pool_size)
+        self._unacked = set()  # yielded, not yet deleted
+        self._deleting = {}  # future: id
+        self._lock = threading.Lock()
         self.ping()  # ensure working
 
+    def _session(self, retry):
+        """Return session with a connection pool that retries requests as given."""
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry
+        )
+        result = requests.Session()
+        result.mount("https://", adapter)
+        result.mount("http://", adapter)
+        return result
+
     def _request(self, method, expect=None, **kwargs):
-        url = f"{SMS.base_url}?api_username={self.username}&api_password={self.password}&method={method}&content_type=json"
-        if kwargs:
-            url = f"{url}&{urllib.parse.urlencode(kwargs)}"
-        response = requests.get(url)
+        params = {
+            "api_username": self.username,
+            "api_password": self.password,
+            "method": method,
+            "content_type": "json",
+            **kwargs,
+        }
+        # a sendSMS that reached the server is never resent, lest it be delivered
+        # twice; only connection failures are retried for it
+        session = self._send_session if method == "sendSMS" else self.session
+        start = time.perf_counter()
+        try:
+            response = session.get(self.url, params=params, timeout=self.timeout)
+        except requests.RequestException as re:
+            _request_seconds.observe(
+                time.perf_counter() - start, method=method, status="error"
+            )
+            raise BackendError(f"Request failed: {re}")
+        _request_seconds.observe(
+            time.perf_counter() - start, method=method, status=response.status_code
+        )
         if response.status_code != 200:
             raise BackendError(f"Unexpected status_code: {response.status_code}")
-        result = response.json()
+        try:
+            result = response.json()
+        except ValueError:
+            raise BackendError("Invalid response")
         status = result["status"]
         if expect and status != expect:
             raise BackendError(f"Unexpected status: {status}")
@@ -51,21 +146,68 @@ class SMS:
         """Confirm connectivity to server."""
         self._request("getIP", "success")
 
-    def receive(self):
-        """Generator to iterate through incoming text messages."""
-        response = self._request("getSMS", did=self.did)
+    def _get_sms(self, limit):
+        """Return up to limit messages held for the DID."""
+        response = self._request("getSMS", did=self.did, limit=limit)
         status = response["status"]
         if status == "no_sms":
-            incoming = ()
+            return []
         elif status == "success":
-            incoming = response["sms"]
-        else:
-            raise BackendError(status)
-        for sms in incoming:
-            id = sms["id"]
-            self._request("deleteSMS", "success", id=id)
-            if sms["type"] == "1":  # incoming
-                yield (_na_to_e164(sms["contact"]), sms["message"])
+            return response["sms"]
+        raise BackendError(status)
+
+    def receive(self):
+        """
+        Generator to iterate through incoming text messages.
+
+        The backlog is fetched in pages of page_size messages. Messages remain on the
+        server until acknowledged through ack, which deletes them in the background,
+        overlapping with the handling of later messages and the fetch of the next
+        page. Messages already yielded by this call are skipped if fetched again;
+        unacknowledged messages are yielded again by later calls. An error deleting
+        a message is raised before a later page is fetched.
+        """
+        seen = set()
+        while True:
+            self._deleted()
+            with self._lock:
+                limit = self.page_size + len(
+                    self._unacked
+                )  # undeleted can be refetched
+            page = self._get_sms(limit)
+            fresh = [sms for sms in page if sms["id"] not in seen]
+            other = []
+            for sms in fresh:
+                seen.add(sms["id"])
+                if sms["type"] == "1":  # incoming
+                    with self._lock:
+                        self._unacked.add(sms["id"])
+                    number = _na_to_e164(sms["contact"])
+                    yield Message(number, sms["message"], sms["id"])
+                else:
+                    other.append(sms["id"])
+            self.ack(other)
+            if not fresh or len(page) < limit:
+                break
+
+    def ack(self, ids):
+        """Acknowledge receipt of messages, deleting them from server in background."""
+        with self._lock:
+            for id in ids:
+                self._unacked.add(id)
+                future = self._executor.submit(
+                    self._request, "deleteSMS", "success", id=id
+                )
+                self._deleting[future] = id
+
+    def _deleted(self):
+        """Collect completed deletions, raising the error of any that failed."""
+        with self._lock:
+            done = [future for future in self._deleting if future.done()]
+            for future in done:
+                self._unacked.discard(self._deleting.pop(future))
+        for future in done:
+            future.result()  # raise deletion error
 
     def send(self, number, message):
         """Send outgoing text message."""
@@ -2,10 +2,15 @@
 
 import click
 import roax.resource
-import vokiz.processor
+import time
+import vokiz.config
+import vokiz.log
 import wrapt
 
-from vokiz.resource import resources, Channel
+from vokiz.resource import resources, Channel, User
+
+# Modules needed by only some commands are imported by those commands, to keep
+# startup fast for scripted invocations; see benchmarks/startup.py.
 
 
 @wrapt.decorator
@@ -22,6 +27,7 @@ def handle_NotFound(wrapped, instance, args, kwargs):
 def cli(config):
     """Vokiz: SMS group messaging."""
     vokiz.config.init(config)
+    vokiz.log.init(vokiz.config.config.log_format, vokiz.config.config.log_level)
 
 
 @cli.command()
@@ -56,6 +62,18 @@ def list_():
     print(f"Channels: {result}.")
 
 
+@cli.command()
+@click.option("--replace", is_flag=True, help="Replace existing channels.")
+def migrate(replace):
+    """Import channel files into the SQLite database."""
+    import vokiz.sqlite
+
+    source = vokiz.resource.Channels("file")
+    target = vokiz.sqlite.Channels(vokiz.config.config.database)
+    result = ", ".join(vokiz.sqlite.migrate(source, target, replace)) or "[none]"
+    print(f"Migrated channels: {result}.")
+
+
 @cli.command()
 @click.argument("channel")
 @click.option(
@@ -64,19 +82,271 @@ def list_():
 @handle_NotFound
 def shell(channel, nick):
     """Enter channel via command line shell."""
+    import vokiz.processor
+
     ch = resources.channels.read(channel)
     vokiz.processor.Processor(ch).shell(nick)
-    resources.channels.update(ch.id, ch)
+    if ch.changed:
+        resources.channels.update(ch.id, ch)
+
+
+def _format(file, format):
+    """Return member file format, inferred from file name if not specified."""
+    if format:
+        return format
+    return "json" if getattr(file, "name", "").endswith(".json") else "csv"
+
+
+@cli.command("import")
+@click.argument("channel")
+@click.argument("file", type=click.File("r"))
+@click.option(
+    "--format", type=click.Choice(["csv", "json"]), help="Member file format."
+)
+@click.option("--partial", is_flag=True, help="Import valid members despite errors.")
+@click.option(
+    "--nick", help="Nick to notify import as.", default="Admin", show_default=True
+)
+@handle_NotFound
+def import_(channel, file, format, partial, nick):
+    """Add members to a channel from a CSV or JSON file."""
+    import csv
+    import json
+    import roax.context
+    import vokiz.processor
+
+    if _format(file, format) == "json":
+        rows = json.load(file)
+    else:
+        rows = list(csv.DictReader(file))
+    try:
+        members = [(row["number"].strip(), row["nick"].strip()) for row in rows]
+    except (AttributeError, KeyError, TypeError):
+        raise click.ClickException("Members must have number and nick.")
+    ch = resources.channels.read(channel)
+    processor = vokiz.processor.Processor(ch)
+    with roax.context.push(context="user", user=User(nick, True, True)):
+        added, errors = processor.add_members(members, partial)
+    for error in errors:
+        print(f"Error: {error}")
+    if ch.changed:
+        resources.channels.update(ch.id, ch)
+    if errors and not partial:
+        raise click.ClickException(f"No members imported: {len(errors)} error(s).")
+    print(f"Imported members: {len(added)}.")
 
 
 @cli.command()
 @click.argument("channel")
+@click.argument("file", type=click.File("w"), default="-")
+@click.option(
+    "--format", type=click.Choice(["csv", "json"]), help="Member file format."
+)
 @handle_NotFound
-def process(channel):
-    """Perform channel processing."""
+def export(channel, file, format):
+    """Write members of a channel to a CSV or JSON file."""
+    import csv
+    import json
+
     ch = resources.channels.read(channel)
-    vokiz.processor.Processor(ch).process()
-    resources.channels.update(ch.id, ch)
+    members = [{"number": p.number, "nick": p.nick} for p in ch.phones]
+    if _format(file, format) == "json":
+        json.dump(members, file, indent=2)
+        file.write("\n")
+    else:
+        writer = csv.DictWriter(file, ["number", "nick"], lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(members)
+
+
+def _process(router, group, outbox):
+    """Process a group of channels sharing a backend, returning elapsed seconds."""
+    start = time.perf_counter()
+    router.receive(group)
+    if outbox:
+        for id in group:
+            backend = router.processors.get(id).backend
+            outbox.drain(lambda id: backend, channel=id)
+    return time.perf_counter() - start
+
+
+def _sharing(channels):
+    """
+    Return (identifiers of all channels sharing a backend with any of channels,
+    mapping of channel to error reading its backend). Only backend configurations
+    are read; channels that cannot be read are left out.
+    """
+    import vokiz.backends
+
+    keys = {}  # id: backend key
+    errors = {}
+    for id in resources.channels.list():
+        try:
+            keys[id] = vokiz.backends.key(resources.channels.backend(id))
+        except roax.resource.NotFound:
+            continue
+        except Exception as e:
+            errors[id] = e
+    wanted = {keys[c] for c in channels if c in keys}
+    return [id for id, key in keys.items() if key in wanted], errors
+
+
+@cli.command()
+@click.argument("channels", nargs=-1)
+@click.option("--all", "all_", is_flag=True, help="Process all channels.")
+@click.option(
+    "--workers",
+    help="Number of backends to process concurrently.",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+)
+def process(channels, all_, workers):
+    """
+    Perform channel processing. Channels sharing a backend with a processed channel
+    are processed with it, as messages for all of them are received together.
+    """
+    import concurrent.futures
+    import vokiz.daemon
+    import vokiz.journal
+    import vokiz.metrics
+    import vokiz.outbox
+    import vokiz.router
+
+    if all_:
+        channels = resources.channels.list()
+    elif not channels:
+        raise click.UsageError("Specify channel(s) to process or --all.")
+    ids, errors = _sharing(channels)
+    failed = []
+    for channel in channels:
+        if channel in errors:
+            failed.append(channel)
+            print(f"Error reading channel: {channel}: {errors[channel]}.")
+        elif channel not in ids:
+            failed.append(channel)
+            print(f"No such channel: {channel}.")
+    outbox = vokiz.outbox.configured()
+    processors = vokiz.daemon.Processors(outbox)
+    router = vokiz.router.Router(processors, vokiz.journal.configured())
+    groups = router.groups(ids)
+    for channel in set(ids) - {id for group in groups for id in group}:
+        failed.append(channel)  # error logged by router
+        print(f"Error loading channel: {channel}.")
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = {
+            executor.submit(_process, router, group, outbox): group for group in groups
+        }
+        for future in concurrent.futures.as_completed(futures):
+            group = futures[future]
+            label = "channel" if len(group) == 1 else "channels"
+            try:
+                elapsed = future.result()  # for the group, received together
+                print(f"Processed {label}: {', '.join(group)} ({elapsed:.3f}s).")
+            except Exception as e:
+                failed.extend(group)
+                print(f"Error processing {label}: {', '.join(group)}: {e}.")
+    if vokiz.config.config.metrics:
+        vokiz.metrics.write(vokiz.config.config.metrics_file)
+    if failed:
+        raise click.ClickException(f"Failed channels: {', '.join(sorted(failed))}.")
+
+
+def _outbox():
+    import vokiz.outbox
+
+    return vokiz.outbox.Outbox(vokiz.config.config.outbox_file)
+
+
+@cli.command()
+@click.argument("channel", required=False)
+def outbox(channel):
+    """List messages queued in the outbox."""
+    entries = _outbox().entries(channel)
+    for e in entries:
+        status = f"failed: {e.error}" if e.failed else f"attempts={e.attempts}"
+        print(f"{e.id} {e.channel} {e.number} ({status}): {e.message}")
+    print(f"Queued messages: {len(entries)}.")
+
+
+@cli.command()
+@click.argument("channel", required=False)
+@click.option("--failed", is_flag=True, help="Also resend failed messages.")
+def flush(channel, failed):
+    """Send messages queued in the outbox now."""
+    import vokiz.backends
+    import vokiz.metrics
+    import vokiz.ratelimit
+
+    outbox = _outbox()
+    if failed:
+        outbox.retry(channel)
+    backends = {}
+
+    def backend(id):
+        if id not in backends:
+            config = resources.channels.read(id).backend
+            backend = vokiz.backends.load(config)
+            backend = vokiz.metrics.Instrumented(backend, config.module)
+            backends[id] = vokiz.ratelimit.limit(backend, config, id)
+        return backends[id]
+
+    sent, errors = outbox.drain(backend, channel=channel, force=True)
+    print(f"Sent messages: {sent}. Errors: {errors}.")
+
+
+@cli.command()
+@click.argument("channels", nargs=-1)
+@click.option(
+    "--interval",
+    help="Seconds between polls.",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    show_default=True,
+)
+@click.option(
+    "--jitter",
+    help="Fraction of interval to randomly vary polls by.",
+    type=click.FloatRange(0, 1),
+    default=0.1,
+    show_default=True,
+)
+@click.option(
+    "--async",
+    "asynchronous",
+    is_flag=True,
+    help="Receive channels concurrently on asynchronous tasks.",
+)
+def serve(channels, interval, jitter, asynchronous):
+    """Continuously poll and process channels (default: all)."""
+    import vokiz.daemon
+
+    vokiz.daemon.Daemon(channels, interval, jitter, asynchronous).run()
+
+
+@cli.command()
+@click.option(
+    "--host", help="Address to listen on.", default="127.0.0.1", show_default=True
+)
+@click.option(
+    "--port", help="Port to listen on.", type=int, default=8080, show_default=True
+)
+@click.option(
+    "--backend", help="Backend module of provider.", default="voipms", show_default=True
+)
+def webhook(host, port, backend):
+    """Receive inbound messages through provider callbacks."""
+    import vokiz.webhook
+
+    from vokiz.backends import BackendError
+
+    print(f"Listening on {host}:{port}.")
+    try:
+        vokiz.webhook.serve(host, port, backend)
+    except BackendError as be:
+        raise click.ClickException(f"{be}.")
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
@@ -13,6 +13,16 @@ app_dir = click.get_app_dir("vokiz")
 @dataclass
 class Config:
     channel_dir: s.str() = f"{app_dir}/channels"
+    channel_cache: s.int(minimum=0) = 32  # decoded channels cached; 0 disables
+    storage: s.str(enum={"file", "sqlite"}) = "file"
+    database: s.str() = f"{app_dir}/vokiz.db"
+    outbox: s.bool() = False
+    outbox_file: s.str() = f"{app_dir}/outbox.db"
+    journal_file: s.str() = f"{app_dir}/journal.db"
+    log_format: s.str(enum={"text", "json"}) = "text"
+    log_level: s.str(enum={"debug", "info", "warning", "error"}) = "info"
+    metrics: s.bool() = False
+    metrics_file: s.str() = f"{app_dir}/metrics.prom"
 
 
 def init(path=None):
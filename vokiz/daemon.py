@@ -0,0 +1,147 @@
+"""Vokiz channel polling daemon module."""
+
+import asyncio
+import contextlib
+import random
+import roax.resource
+import signal
+import threading
+import vokiz.config
+import vokiz.journal
+import vokiz.log
+import vokiz.metrics
+import vokiz.outbox
+import vokiz.processor
+import vokiz.router
+
+from vokiz.backends import BackendError
+from vokiz.resource import resources
+
+
+class Processors:
+    """Warm channel processors, reloaded if a channel file is changed externally."""
+
+    def __init__(self, outbox=None):
+        self.outbox = outbox
+        self._items = {}  # id: (processor, mtime)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def ids(self):
+        """Return identifiers of channels with loaded processors."""
+        return list(self._items)
+
+    def discard(self, id):
+        """Discard the processor for a channel, if loaded."""
+        self._items.pop(id, None)
+
+    def _lock_for(self, id):
+        with self._lock:
+            return self._locks.setdefault(id, threading.RLock())
+
+    def _load(self, id):
+        mtime = resources.channels.mtime(id)
+        processor, loaded = self._items.get(id, (None, None))
+        if mtime != loaded:
+            channel = resources.channels.read(id)
+            processor = vokiz.processor.Processor(channel, self.outbox)
+            self._items[id] = (processor, mtime)
+        return processor
+
+    def get(self, id):
+        """Return processor for channel, loading it if not loaded or changed."""
+        with self._lock_for(id):
+            return self._load(id)
+
+    def mtime(self, id):
+        """Return modification time of channel when its processor was loaded."""
+        return self._items[id][1]
+
+    @contextlib.contextmanager
+    def open(self, id):
+        """Yield exclusive processor for channel, persisting the channel if changed."""
+        with self._lock_for(id):
+            processor = self._load(id)
+            try:
+                yield processor
+            finally:
+                if processor.channel.changed:
+                    resources.channels.update(id, processor.channel)
+                    self._items[id] = (processor, resources.channels.mtime(id))
+
+
+class Daemon:
+    """Continuously polls and processes channels, keeping processors warm."""
+
+    def __init__(self, channels=None, interval=10.0, jitter=0.1, asynchronous=False):
+        self.channels = channels  # all channels if empty
+        self.interval = interval
+        self.jitter = jitter
+        self.asynchronous = asynchronous  # receive channel groups concurrently
+        self.outbox = vokiz.outbox.configured()
+        self.processors = Processors(self.outbox)
+        self.router = vokiz.router.Router(self.processors, vokiz.journal.configured())
+        self.stopped = threading.Event()
+
+    def stop(self, signum=None, frame=None):
+        """Stop polling once processing of the current channel is complete."""
+        self.stopped.set()
+
+    def poll(self):
+        """Receive and handle messages once for each channel."""
+        ids = self.channels or resources.channels.list()
+        for id in set(self.processors.ids()) - set(ids):
+            self.processors.discard(id)
+        groups = self.router.groups(ids)
+        if self.asynchronous:
+            asyncio.run(self._receive_async(groups))
+        else:
+            for group in groups:
+                if self.stopped.is_set():
+                    break
+                try:
+                    self.router.receive(group)
+                except Exception as e:
+                    self._failed(group, e)
+        if vokiz.config.config.metrics:
+            vokiz.metrics.write(vokiz.config.config.metrics_file)
+
+    async def _receive_async(self, groups):
+        """Receive and handle messages for groups concurrently on one event loop."""
+
+        async def receive(group):
+            try:
+                await self.router.receive_async(group)
+            except Exception as e:
+                self._failed(group, e)
+
+        await asyncio.gather(*(receive(group) for group in groups))
+
+    def _failed(self, group, error):
+        """Log error processing group; its processors reload unless a backend error."""
+        if isinstance(error, BackendError):
+            text = f"Backend error processing {', '.join(group)}: {error}."
+            vokiz.log.error("process", text, channels=group)
+        else:
+            text = f"Error processing {', '.join(group)}: {error}."
+            vokiz.log.error("process", text, channels=group)
+            for id in group:
+                self.processors.discard(id)  # reload on next poll
+
+    def run(self):
+        """Poll channels at interval with jitter until stopped by SIGTERM or SIGINT."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if self.outbox:
+            worker = vokiz.outbox.Worker(self.outbox, self._backend)
+            worker.start()
+        while not self.stopped.is_set():
+            self.poll()
+            jitter = random.uniform(-self.jitter, self.jitter)
+            self.stopped.wait(max(0, self.interval * (1 + jitter)))
+        if self.outbox:
+            worker.stop()
+
+    def _backend(self, id):
+        """Return backend to send outbox messages for a channel."""
+        return self.processors.get(id).backend
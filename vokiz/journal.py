@@ -0,0 +1,158 @@
+"""Vokiz inbound message journal module."""
+
+import asyncio
+import hashlib
+import threading
+import time
+import vokiz.backends
+import vokiz.config
+import vokiz.sqlite
+
+_ddl = """
+CREATE TABLE IF NOT EXISTS handled (
+    source TEXT NOT NULL,
+    id TEXT NOT NULL,
+    time REAL NOT NULL,
+    PRIMARY KEY (source, id)
+);
+CREATE INDEX IF NOT EXISTS handled_time ON handled (time);
+"""
+
+
+def source(backend):
+    """Return journal source identifying the account and number of a backend."""
+    key = repr(vokiz.backends.key(backend))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class Journal:
+    """
+    Journal of identifiers of handled incoming messages. Recorded identifiers are
+    held in memory until flush writes them in a single short transaction; they are
+    retained for the retention period, to detect messages delivered again that were
+    handled but not acknowledged.
+    """
+
+    def __init__(self, file, retention=7 * 86400):
+        self.file = file
+        self.retention = retention
+        self._db = vokiz.sqlite.Database(file)
+        self._recorded = {}  # (source, id): time
+        self._lock = threading.Lock()
+        with self._db.connection as c:
+            c.executescript(_ddl)
+            c.execute("DELETE FROM handled WHERE time < ?", (time.time() - retention,))
+
+    def handled(self, source, id):
+        """Return if a message from source has been recorded as handled."""
+        with self._lock:
+            if (source, str(id)) in self._recorded:
+                return True
+        return (
+            self._db.connection.execute(
+                "SELECT 1 FROM handled WHERE source = ? AND id = ?", (source, str(id))
+            ).fetchone()
+            is not None
+        )
+
+    def record(self, source, id):
+        """Record message from source as handled; durable once flushed."""
+        with self._lock:
+            self._recorded[(source, str(id))] = time.time()
+
+    def flush(self):
+        """Make recorded messages durable."""
+        with self._lock:
+            recorded, self._recorded = self._recorded, {}
+        if not recorded:
+            return
+        try:
+            with self._db.connection as c:
+                c.executemany(
+                    "INSERT OR IGNORE INTO handled VALUES (?, ?, ?)",
+                    ((s, i, t) for (s, i), t in recorded.items()),
+                )
+        except BaseException:
+            with self._lock:
+                self._recorded = {**recorded, **self._recorded}  # retry next flush
+            raise
+
+
+def receive(backend, journal=None, source=None, batch=100, drain=None):
+    """
+    Generator to iterate through incoming messages of a backend, skipping those the
+    journal records as handled. Messages are recorded as handled when the next
+    message is requested, and acknowledged to the backend in batches once their
+    records are flushed. If supplied, drain is called before each batch is
+    committed, to wait until the sends that handling its messages queued are made.
+    """
+    ack = getattr(backend, "ack", None)
+    pending = []
+
+    def commit():
+        if drain:
+            drain()
+        if journal:
+            journal.flush()
+        if ack and pending:
+            ack(list(pending))
+        pending.clear()
+
+    try:
+        for message in backend.receive():
+            id = getattr(message, "id", None)
+            if id is None:  # backend does not require acknowledgement
+                yield message
+                continue
+            if not (journal and journal.handled(source, id)):
+                yield message
+                if journal:
+                    journal.record(source, id)
+            pending.append(id)
+            if len(pending) >= batch:
+                commit()
+    finally:
+        commit()  # messages handled before an error are still acknowledged
+
+
+async def receive_async(backend, journal=None, source=None, batch=100, drain=None):
+    """
+    Asynchronous counterpart of receive, for asynchronous backends; drain is a
+    coroutine function. Journal queries and flushes are run in an executor, so as
+    not to block the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    pending = []
+
+    async def commit():
+        if drain:
+            await drain()
+        if journal:
+            await loop.run_in_executor(None, journal.flush)
+        if hasattr(backend, "ack") and pending:
+            await backend.ack(list(pending))
+        pending.clear()
+
+    async def handled(id):
+        return journal and await loop.run_in_executor(None, journal.handled, source, id)
+
+    try:
+        async for message in backend.receive():
+            id = getattr(message, "id", None)
+            if id is None:
+                yield message
+                continue
+            if not await handled(id):
+                yield message
+                if journal:
+                    journal.record(source, id)  # in memory; does not block
+            pending.append(id)
+            if len(pending) >= batch:
+                await commit()
+    finally:
+        await commit()
+
+
+def configured():
+    """Return the configured journal."""
+    return Journal(vokiz.config.config.journal_file)
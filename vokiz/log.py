@@ -0,0 +1,53 @@
+"""Vokiz logging module."""
+
+import json
+import logging
+import sys
+
+logger = logging.getLogger("vokiz")
+
+_tags = {"receive": "R", "send": "S", "queue": "Q", "notify": "I"}
+
+
+def event(name, text, level=logging.INFO, **fields):
+    """Log a named event, with text for the console and fields for structured logs."""
+    logger.log(level, text, extra={"event": name, "fields": fields})
+
+
+def error(name, text, **fields):
+    """Log a named error event."""
+    event(name, text, logging.ERROR, **fields)
+
+
+class TextFormatter(logging.Formatter):
+    """Formats events as console lines, prefixed with the tag of the event."""
+
+    def format(self, record):
+        if record.levelno >= logging.ERROR:
+            tag = "E"
+        else:
+            tag = _tags.get(getattr(record, "event", None), "I")
+        return f"[{tag}] {record.getMessage()}"
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats events as JSON objects, one per line."""
+
+    def format(self, record):
+        result = {
+            "time": record.created,
+            "level": record.levelname.lower(),
+            "event": getattr(record, "event", None),
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        return json.dumps(result, default=str)
+
+
+def init(format="text", level="info"):
+    """Configure logging of events to standard output."""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter() if format == "json" else TextFormatter())
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
@@ -0,0 +1,192 @@
+"""Vokiz metrics module."""
+
+import bisect
+import contextlib
+import os
+import os.path
+import tempfile
+import threading
+import time
+import vokiz.segments
+
+_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return f"{{{pairs}}}"
+
+
+class _Metric:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}  # label values: value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        try:
+            return tuple(str(labels[name]) for name in self.labels)
+        except KeyError as ke:
+            raise ValueError(f"missing label {ke} for metric {self.name}")
+
+    def render(self):
+        """Return metric in Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._lines(key, value) for key, value in items)
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, per set of label values."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """Increment the counter for the label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the count for the label values."""
+        return self._values.get(self._key(labels), 0)
+
+    def _lines(self, key, value):
+        return f"{self.name}{_labels(self.labels, key)} {value}"
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in buckets, per set of label values."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=_buckets):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """Record an observed value for the label values."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the seconds elapsed in a block; also usable as a decorator."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _lines(self, key, value):
+        counts, total = value
+        names = (*self.labels, "le")
+        result = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += count
+            labels = _labels(names, (*key, bound))
+            result.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _labels(self.labels, key)
+        result.append(f"{self.name}_sum{labels} {total}")
+        result.append(f"{self.name}_count{labels} {cumulative}")
+        return "\n".join(result)
+
+
+_metrics = {}
+_lock = threading.Lock()
+
+
+def _register(cls, name, help, labels, **kwargs):
+    with _lock:
+        result = _metrics.get(name)
+        if result is None:
+            result = cls(name, help, labels, **kwargs)
+            _metrics[name] = result
+        elif type(result) is not cls or result.labels != tuple(labels):
+            raise ValueError(f"conflicting registration of metric {name}")
+        return result
+
+
+def counter(name, help, labels=()):
+    """Return the registered counter with name, registering it if required."""
+    return _register(Counter, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=_buckets):
+    """Return the registered histogram with name, registering it if required."""
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+def render():
+    """Return all registered metrics in Prometheus text exposition format."""
+    with _lock:
+        metrics = sorted(_metrics.values(), key=lambda m: m.name)
+    return "".join(f"{m.render()}\n" for m in metrics)
+
+
+def write(file):
+    """Atomically write all registered metrics to a file, for a textfile collector."""
+    dir = os.path.dirname(os.path.abspath(file))
+    os.makedirs(dir, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=dir, prefix=".metrics.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(render())
+        os.chmod(temp, 0o644)
+        os.replace(temp, file)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+_sends = counter("vokiz_sends_total", "Messages sent through a backend.", ["backend"])
+_failures = counter(
+    "vokiz_send_failures_total", "Messages that failed to send.", ["backend"]
+)
+_segments = counter(
+    "vokiz_segments_total", "SMS segments of messages sent.", ["backend", "charset"]
+)
+_send_seconds = histogram(
+    "vokiz_send_seconds", "Time to send a message through a backend.", ["backend"]
+)
+
+
+class Instrumented:
+    """Backend wrapper that counts and times sends."""
+
+    def __init__(self, backend, module):
+        self.backend = backend
+        self.module = module
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def receive(self):
+        """Receive incoming text messages through the wrapped backend."""
+        return self.backend.receive()
+
+    def send(self, number, message):
+        """Send outgoing text message, recording its outcome, segments and duration."""
+        _sends.inc(backend=self.module)
+        segments = vokiz.segments.segments(message)
+        _segments.inc(segments.count, backend=self.module, charset=segments.charset)
+        try:
+            with _send_seconds.time(backend=self.module):
+                return self.backend.send(number, message)
+        except Exception:
+            _failures.inc(backend=self.module)
+            raise
@@ -0,0 +1,196 @@
+"""Vokiz durable outbound message queue module."""
+
+import threading
+import time
+import uuid
+import vokiz.config
+import vokiz.log
+import vokiz.scheduler
+import vokiz.sqlite
+
+from dataclasses import dataclass
+
+_ddl = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    number TEXT NOT NULL,
+    message TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    due REAL NOT NULL,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    claim TEXT,
+    priority INTEGER NOT NULL DEFAULT 2
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (failed, due);
+"""
+
+
+@dataclass
+class Entry:
+    """A message in the outbox."""
+
+    id: int
+    channel: str
+    number: str
+    message: str
+    attempts: int
+    due: float
+    failed: bool
+    error: str
+
+
+class Outbox:
+    """
+    Persistent journal of outbound messages. Messages are delivered by draining the
+    outbox; failed sends are retried with exponential backoff until the maximum
+    number of attempts, after which they are kept as failed.
+
+    Messages are drained by priority class, highest first; a message that has been
+    due for longer is ranked as if its priority were higher by one class for each
+    aging seconds, so lower classes still make progress.
+    """
+
+    def __init__(self, file, attempts=8, backoff=5.0, lease=60.0, aging=10.0):
+        self.file = file
+        self.attempts = attempts
+        self.backoff = backoff  # seconds before first retry; doubles each attempt
+        self.lease = lease  # seconds a message is claimed for while being sent
+        self.aging = aging
+        self._db = vokiz.sqlite.Database(file)
+        with self._db.connection as c:
+            c.executescript(_ddl)
+            columns = [row[1] for row in c.execute("PRAGMA table_info (outbox)")]
+            if "priority" not in columns:  # outbox created by previous version
+                c.execute(
+                    "ALTER TABLE outbox ADD COLUMN priority INTEGER NOT NULL DEFAULT 2"
+                )
+
+    def put(self, channel, number, message, priority=vokiz.scheduler.ADDRESSED):
+        """Add a message to the outbox, to be sent as soon as possible."""
+        with self._db.connection as c:
+            c.execute(
+                "INSERT INTO outbox (channel, number, message, due, priority) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (channel, number, message, time.time(), priority),
+            )
+
+    def _select(self, where, params, order="id"):
+        sql = "SELECT id, channel, number, message, attempts, due, failed, error "
+        rows = self._db.connection.execute(
+            f"{sql} FROM outbox {where} ORDER BY {order}", params
+        )
+        return [Entry(*row[:6], bool(row[6]), row[7]) for row in rows]
+
+    def entries(self, channel=None):
+        """Return list of entries in the outbox, optionally for one channel."""
+        if channel:
+            return self._select("WHERE channel = ?", (channel,))
+        return self._select("", ())
+
+    def _claim(self, channel, force, limit):
+        """Claim due messages for sending, returning their entries."""
+        now = time.time()
+        claim = uuid.uuid4().hex
+        where = "failed = 0"
+        params = []
+        if not force:
+            where += " AND due <= ?"
+            params.append(now)
+        if channel:
+            where += " AND channel = ?"
+            params.append(channel)
+        with self._db.connection as c:  # lease guards against concurrent drains
+            c.execute(
+                "UPDATE outbox SET due = ?, claim = ? WHERE id IN (SELECT id FROM "
+                f"outbox WHERE {where} ORDER BY due + priority * ?, id LIMIT ?)",
+                (now + self.lease, claim, *params, self.aging, limit),
+            )
+        return self._select("WHERE claim = ?", (claim,), "priority, id")
+
+    def _sent(self, entry):
+        with self._db.connection as c:
+            c.execute("DELETE FROM outbox WHERE id = ?", (entry.id,))
+
+    def _error(self, entry, error):
+        attempts = entry.attempts + 1
+        failed = attempts >= self.attempts
+        due = time.time() + self.backoff * 2 ** (attempts - 1)
+        with self._db.connection as c:
+            c.execute(
+                "UPDATE outbox SET attempts = ?, due = ?, failed = ?, error = ? "
+                "WHERE id = ?",
+                (attempts, due, failed, str(error), entry.id),
+            )
+
+    def drain(self, backend, channel=None, force=False, limit=100):
+        """
+        Send due messages, returning (sent, errors) counts. The backend function
+        returns the backend to send messages for a channel. If force is true,
+        messages awaiting retry are sent immediately.
+        """
+        sent = errors = 0
+        while True:
+            entries = self._claim(channel, force, -1 if force else limit)
+            if not entries:
+                return sent, errors
+            for entry in entries:
+                text = f"{entry.number}: {entry.message}"
+                vokiz.log.event(
+                    "send", text, channel=entry.channel, number=entry.number
+                )
+                try:
+                    backend(entry.channel).send(entry.number, entry.message)
+                except Exception as error:  # includes failure to load backend
+                    text = f"Error sending to {entry.number}: {error}."
+                    vokiz.log.error(
+                        "send", text, channel=entry.channel, number=entry.number
+                    )
+                    self._error(entry, error)
+                    errors += 1
+                else:
+                    self._sent(entry)
+                    sent += 1
+            if force:
+                return sent, errors  # all claimed at once; failures are not resent
+
+    def retry(self, channel=None):
+        """Return failed messages to the outbox to be sent again."""
+        sql = "UPDATE outbox SET failed = 0, attempts = 0, due = ? WHERE failed = 1"
+        params = [time.time()]
+        if channel:
+            sql += " AND channel = ?"
+            params.append(channel)
+        with self._db.connection as c:
+            return c.execute(sql, params).rowcount
+
+
+class Worker(threading.Thread):
+    """Background thread that drains an outbox at an interval until stopped."""
+
+    def __init__(self, outbox, backend, interval=1.0):
+        super().__init__(name="outbox", daemon=True)
+        self.outbox = outbox
+        self.backend = backend
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.outbox.drain(self.backend)
+            except Exception as e:
+                vokiz.log.error("outbox", f"Error draining outbox: {e}.")
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        """Stop the worker after its current drain completes."""
+        self.stopped.set()
+        self.join()
+
+
+def configured():
+    """Return the configured outbox, or None if sending through outbox is disabled."""
+    config = vokiz.config.config
+    return Outbox(config.outbox_file) if config.outbox else None
@@ -1,20 +1,36 @@
 """Vokiz channel processing module."""
 
+import asyncio
 import collections.abc
+import concurrent.futures
+import dataclasses
+import functools
 import inspect
-import readline
 import roax.context
 import roax.schema as s
 import shlex
 import vokiz.backends
 import vokiz.backends.none
+import vokiz.journal
+import vokiz.log
+import vokiz.metrics
+import vokiz.ratelimit
 import vokiz.resource
+import vokiz.scheduler
 import vokiz.schema as vs
+import vokiz.segments
 import wrapt
 
 from dataclasses import dataclass, field
 from vokiz.backends import BackendError
 
+_received = vokiz.metrics.counter(
+    "vokiz_messages_received_total", "Messages received.", ["channel"]
+)
+_command_seconds = vokiz.metrics.histogram(
+    "vokiz_command_seconds", "Time to evaluate a command.", ["command"]
+)
+
 
 class Error(Exception):
     """Raised when error should be returned to the sender."""
@@ -39,40 +55,55 @@ class cmd:
 
     def __call__(self, function):
         function._command = self
+        self.params = cmd._params(function)
 
         def wrapper(wrapped, instance, args, kwargs):
             if not self.auth():
                 raise Unauthorized
-            args = list(args)  # mutable
-            _args = []
-            _kwargs = {}
-            for name, param in inspect.signature(wrapped).parameters.items():
-                if not args:
-                    break  # missing argument(s) will be caught in call to method
-                elif param.kind == param.POSITIONAL_OR_KEYWORD:
-                    arg = args.pop(0)
-                    try:
-                        _args.append(
-                            wrapped.__annotations__.get(name, cmd._str).str_decode(arg)
-                        )
-                    except s.SchemaError:
-                        raise Error(f"Invalid {name}: {arg}.")
-                elif param.kind == param.VAR_KEYWORD:
-                    for arg in args:
-                        try:
-                            key, value = arg.split("=", 1)
-                        except ValueError:
-                            raise Error(f"Invalid key-value: {arg}")
-                        _kwargs[key] = value
-                    args.clear()
-                else:
-                    raise TypeError("unsupported command parameter type")
-            if args:
-                raise TypeError(f"{wrapped.__name__}: too many arguments")
+            _args, _kwargs = self._decode(args)
             return wrapped(*_args, **_kwargs)
 
         return wrapt.decorator(wrapper)(function)
 
+    @staticmethod
+    def _params(function):
+        """Return (name, schema) of command parameters; None schema for kwargs."""
+        result = []
+        for name, param in list(inspect.signature(function).parameters.items())[1:]:
+            if param.kind == param.POSITIONAL_OR_KEYWORD:
+                result.append((name, function.__annotations__.get(name, cmd._str)))
+            elif param.kind == param.VAR_KEYWORD:
+                result.append((name, None))
+            else:
+                raise TypeError("unsupported command parameter type")
+        return result
+
+    def _decode(self, args):
+        """Decode command string arguments into positional and keyword arguments."""
+        _args = []
+        _kwargs = {}
+        args = list(args)  # mutable
+        for name, schema in self.params:
+            if not args:
+                break  # missing argument(s) will be caught in call to method
+            elif schema is None:
+                for arg in args:
+                    try:
+                        key, value = arg.split("=", 1)
+                    except ValueError:
+                        raise Error(f"Invalid key-value: {arg}")
+                    _kwargs[key] = value
+                args.clear()
+            else:
+                arg = args.pop(0)
+                try:
+                    _args.append(schema.str_decode(arg))
+                except s.SchemaError:
+                    raise Error(f"Invalid {name}: {arg}.")
+        if args:
+            raise TypeError("too many arguments")
+        return _args, _kwargs
+
 
 def ctx(type):
     """Return a context object of the specified type."""
@@ -96,6 +127,14 @@ def _str_dataclass(o):
     return _str_dict(_dict_dataclass(o))
 
 
+def _str_delivery(d):
+    """Return a string summarizing a message delivery."""
+    text = f"Sent: {len(d.sent)}. Queued: {len(d.queued)}. Muted: {len(d.muted)}."
+    if d.failed:
+        text += f" Failed: {len(d.failed)} ({_str_list(d.failed)})."
+    return text
+
+
 def _dict_dataclass(o):
     """Return a dict representing attributes in a dataclass."""
     return {attr: getattr(o, attr) for attr in o.__annotations__}
@@ -121,24 +160,65 @@ class auth:
         return ctx("phone") is not None
 
 
+@dataclass
+class Delivery:
+    """Summary of a message delivery to phones."""
+
+    sent: list = field(default_factory=list)
+    queued: list = field(default_factory=list)
+    muted: list = field(default_factory=list)
+    failed: dict = field(default_factory=dict)
+    segments: int = 0  # per message sent
+
+
 class DataclassMapping(collections.abc.Mapping):
-    """TODO: Description."""
+    """
+    Mapping of key attribute to dataclass items in a sequence.
+
+    Lookups are served from a hash index; mutations through the mapping are written
+    through to the underlying sequence. Index entries are validated on each hit, and
+    a miss rebuilds the index if the sequence changed size or a key attribute of a
+    record held in a channel was changed in-place, so stale entries are repaired
+    lazily. Call reindex after changing a key attribute of other items in-place.
+    """
 
     def __init__(self, sequence, key, insensitive=False):
         self.sequence = sequence
         self.key = key
         self.insensitive = insensitive
+        self.reindex()
+
+    def _fold(self, key):
+        return key.lower() if self.insensitive else key
+
+    def _item_key(self, item):
+        return self._fold(getattr(item, self.key))
+
+    def reindex(self):
+        """Rebuild the index from the underlying sequence."""
+        self._renames = vokiz.resource.renames(self.sequence)
+        self._index = {self._item_key(item): item for item in self.sequence}
+
+    def _lookup(self, key):
+        item = self._index.get(key)
+        if item is not None and self._item_key(item) == key:
+            return item
+        return None
 
     def __getitem__(self, key):
-        if self.insensitive:
-            key = key.lower()
-        for item in self.sequence:
-            item_key = getattr(item, self.key)
-            if self.insensitive:
-                item_key = item_key.lower()
-            if item_key == key:
-                return item
-        raise KeyError(key)
+        folded = self._fold(key)
+        item = self._lookup(folded)
+        stale = (
+            folded in self._index
+            or len(self._index) != len(self.sequence)
+            or self._renames != vokiz.resource.renames(self.sequence)
+        )
+        if item is None and stale:
+            self.reindex()  # sequence or item keys modified outside of mapping
+            item = self._lookup(folded)
+        if item is None:
+            raise KeyError(key)
+        return item
 
     def __iter__(self):
         for key in [getattr(item, self.key) for item in self.sequence]:
@@ -148,40 +228,55 @@ class DataclassMapping(collections.abc.Mapping):
         return len(self.sequence)
 
     def __delitem__(self, key):
-        self.sequence.remove(self[key])
+        item = self[key]
+        self.sequence.remove(item)
+        del self._index[self._item_key(item)]
 
     def add(self, item):
-        """TODO: Description."""
+        """Add item to the mapping, raising ValueError if its key already exists."""
         item_key = getattr(item, self.key)
         if item_key in self:
             raise ValueError(f"duplicate key: {item_key}")
         self.sequence.append(item)
+        self._index[self._fold(item_key)] = item
 
 
 class Processor:
     """TODO: Description."""
 
-    def __init__(self, channel):
+    def __init__(self, channel, outbox=None):
         self.channel = channel
-        self.commands = self._commands()
+        self.outbox = outbox  # if set, messages are queued in outbox instead of sent
+        self.commands = {
+            name: inspect.getattr_static(type(self), attr).__get__(self, type(self))
+            for name, attr in self._commands().items()
+        }
         self.users = DataclassMapping(self.channel.users, "nick", insensitive=True)
         self.phones = DataclassMapping(self.channel.phones, "number")
+        self._recipients = None
+        self.scheduler = None  # if set, messages are queued in scheduler to be sent
         try:
-            self.backend = vokiz.backends.load(channel.backend)
+            self.backend = self._load_backend(channel.backend)
         except BackendError as be:
-            print(f"Backend error: {be}.")
+            vokiz.log.error("backend", f"Backend error: {be}.", channel=channel.id)
             self.backend = vokiz.backends.none.SMS()  # use dummy backend
 
-    def _commands(self):
-        """Return name-to-method mapping of commands."""
-        inspect.getmembers(self)
-        result = {}
-        for member in inspect.getmembers(self, inspect.ismethod):
-            name, method = member[0], member[1]
-            cmd = getattr(method.__func__, "_command", None)
-            if cmd:
-                name = cmd.name or name
-                result[name] = method
+    def _load_backend(self, config):
+        """Load backend, rate limited as configured."""
+        backend = vokiz.metrics.Instrumented(vokiz.backends.load(config), config.module)
+        return vokiz.ratelimit.limit(backend, config, self.channel.id)
+
+    @classmethod
+    def _commands(cls):
+        """Return name-to-attribute mapping of commands, computed once per class."""
+        result = cls.__dict__.get("_command_attrs")
+        if result is None:
+            result = {}
+            for attr, value in inspect.getmembers(cls):
+                command = getattr(value, "_command", None)
+                if isinstance(command, cmd):
+                    result[command.name or attr] = attr
+            cls._command_attrs = result
         return result
 
     def eval(self, line):
@@ -198,7 +293,8 @@ class Processor:
                     method = self.commands.get(command)
                     if not method:
                         raise Unauthorized
-                    return method(*args)
+                    with _command_seconds.time(command=command):
+                        return method(*args)
                 except Unauthorized:
                     return f"Unknown commnd: {command}."
                 except TypeError:
@@ -210,7 +306,9 @@ class Processor:
                     )
                 line = f"@{self.channel.rcpt} {line}"
             nick, message = f"{line} ".split(" ", 1)
-            self.send(nick[1:], message)
+            delivery = self.send(nick[1:], message)
+            if auth.shell() or (delivery.failed and auth.op()):
+                return _str_delivery(delivery)
         except Error as e:
             return f"Error: {e}"
 
@@ -225,34 +323,113 @@ class Processor:
         message = message.strip()
         if not message:
             raise Error(f"Refusing to send empty message to {nick}.")
-        header = self.channel.head.format_map({"from": ctx("user").nick, "to": nick})
+        sender = ctx("user").nick
+        header = self.channel.head.format_map({"from": sender, "to": nick})
         phones = self._resolve(nick)
         if not phones:
             raise Error(f"No such nick: {nick}.")
-        for phone in phones:
-            self._send(phone, f"{header}{message}")
+        text = self._compose(message, header, f"{sender}: ")
+        if nick == self.channel.aliases.all:
+            return self._deliver(phones, text, vokiz.scheduler.BROADCAST)
+        return self._deliver(phones, text, vokiz.scheduler.ADDRESSED)
+
+    def _compose(self, message, header="", short=""):
+        """Return text of message with header, encoded to minimize segments."""
+        config = self.channel.backend
+        headers = [header, short, ""] if config.trim_head and header else [header]
+        if config.transliterate:
+            message = vokiz.segments.transliterate(message)
+            headers = [vokiz.segments.transliterate(h) for h in headers]
+        return vokiz.segments.compose(message, headers)
 
     def _resolve(self, nick):
         """Return list of phones associated with a nick, including aliases."""
-        return [
-            phone
-            for phone in self.phones.values()
-            if nick == self.channel.aliases.all
-            or phone.nick == nick
-            or (nick == self.channel.aliases.ops and self.users[phone.nick].op)
-        ]
-
-    def _send(self, phone, message):
-        """Send a message to a phone."""
+        if self._recipients is None:
+            self._recipients = self._recipients_map()
+        return list(self._recipients.get(nick, ()))
+
+    def _recipients_map(self):
+        """Return mapping of nicks and aliases to their associated phones."""
+        aliases = self.channel.aliases
+        result = {}
+        for phone in self.phones.values():
+            keys = {phone.nick, aliases.all}
+            user = self.users.get(phone.nick)
+            if user and user.op:
+                keys.add(aliases.ops)
+            for key in keys:
+                result.setdefault(key, []).append(phone)
+        return result
+
+    def _invalidate(self):
+        """Invalidate recipients resolved from channel membership and aliases."""
+        self._recipients = None
+
+    def _send(self, phone, message, priority=vokiz.scheduler.ADDRESSED):
+        """Send a message to a phone, returning error if sending failed."""
         if phone.mute:
             return
-        print(f"[S] {phone.number}: {message}")
+        if self.scheduler or self.outbox:
+            self._queue(phone.number, message, priority)
+            return
+        return self._transmit(phone.number, message)
+
+    def _transmit(self, number, message):
+        """Send a message through the backend, returning error if sending failed."""
+        self._log_send(number, message)
         try:
-            self.backend.send(phone.number, message)
+            self.backend.send(number, message)
         except BackendError as error:
-            print(f"[E] Error sending to {phone.number}: {error}.")  # FIXME: log
+            self._log_error(number, error)
+            return error
+
+    def _log_send(self, number, message):
+        text = f"{number}: {message}"
+        vokiz.log.event("send", text, channel=self.channel.id, number=number)
+
+    def _log_error(self, number, error):
+        text = f"Error sending to {number}: {error}."
+        vokiz.log.error("send", text, channel=self.channel.id, number=number)
+
+    def _queue(self, number, message, priority):
+        """Queue a message to be sent by priority, rather than sending it now."""
+        if self.scheduler:
+            self.scheduler.put(priority, number, message)
+        else:
+            text = f"{number}: {message}"
+            vokiz.log.event("queue", text, channel=self.channel.id, number=number)
+            self.outbox.put(self.channel.id, number, message, priority)
+
+    def _deliver(self, phones, message, priority):
+        """Send a message to phones, concurrently if configured by the backend."""
+        result = Delivery(segments=vokiz.segments.segments(message).count)
+        targets = []
+        for phone in phones:
+            if phone.mute:
+                result.muted.append(phone.number)
+            else:
+                targets.append(phone)
+        if self.scheduler or self.outbox:
+            for phone in targets:
+                self._queue(phone.number, message, priority)
+            result.queued = [phone.number for phone in targets]
+            return result
+        workers = min(self.channel.backend.concurrency, len(targets))
+        if workers > 1:
+            with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+                errors = list(executor.map(lambda p: self._send(p, message), targets))
+        else:
+            errors = [self._send(phone, message) for phone in targets]
+        for phone, error in zip(targets, errors):
+            if error:
+                result.failed[phone.number] = str(error)
+            else:
+                result.sent.append(phone.number)
+        return result
 
     def shell(self, nick):
+        import readline  # line editing for input
+
         prompt = f"{nick}@{self.channel.id}: "
         user = vokiz.resource.User(nick, True, True)
         with roax.context.push(context="shell"):
@@ -281,30 +458,104 @@ class Processor:
         return f"Usage: {' '.join(elements)}."
 
     def notify(self, event):
-        message = f"{ctx('user').nick} {event}."
+        message = self._compose(f"{ctx('user').nick} {event}.")
         phones = self._resolve(self.channel.aliases.ops)
         if not phones:
-            print(f"[I] {message}")
-        for phone in phones:
-            self._send(phone, message)
-
-    def process(self):
-        """Process incoming messages."""
-        with roax.context.push(context="process"):
-            for number, message in self.backend.receive():
-                print(f"[R] {number}: {message}")
-                phone = self.phones.get(number)
-                if not phone:  # ignore messages from unregistered numbers
-                    continue
-                try:
-                    user = self.users[phone.nick]
-                except KeyError:
-                    continue
-                with roax.context.push(context="phone", phone=phone):
-                    with roax.context.push(context="user", user=user):
-                        response = self.eval(message)
-                        if response:
-                            self._send(phone, response)
+            vokiz.log.event("notify", message, channel=self.channel.id)
+        return self._deliver(phones, message, vokiz.scheduler.NOTIFY)
+
+    def handle(self, number, message):
+        """Handle an incoming message from a phone number."""
+        _received.inc(channel=self.channel.id)
+        text = f"{number}: {message}"
+        vokiz.log.event("receive", text, channel=self.channel.id, number=number)
+        phone = self.phones.get(number)
+        if not phone:  # ignore messages from unregistered numbers
+            return
+        try:
+            user = self.users[phone.nick]
+        except KeyError:
+            return
+        with roax.context.push(context="phone", phone=phone):
+            with roax.context.push(context="user", user=user):
+                response = self.eval(message)
+                if response:
+                    text = self._compose(response)
+                    self._send(phone, text, vokiz.scheduler.REPLY)
+
+    def process(self, journal=None):
+        """
+        Process incoming messages, recording handled messages in journal. Unless
+        queued in an outbox, resulting sends are scheduled by priority, so replies
+        are not held behind broadcasts; messages are only acknowledged once their
+        resulting sends are made.
+        """
+        source = vokiz.journal.source(self.channel.backend)
+        drain = None
+        if not self.outbox:
+            workers = self.channel.backend.concurrency
+            self.scheduler = vokiz.scheduler.Scheduler(self._transmit, workers)
+            drain = self.scheduler.wait
+        try:
+            with roax.context.push(context="process"):
+                received = vokiz.journal.receive(
+                    self.backend, journal, source, drain=drain
+                )
+                for number, message in received:
+                    self.handle(number, message)
+        finally:
+            scheduler, self.scheduler = self.scheduler, None
+            if scheduler:
+                scheduler.close()
+
+    async def process_async(self, backend=None, journal=None):
+        """
+        Asynchronous counterpart of process, receiving through an asynchronous
+        backend; if none is supplied, the processor's backend is adapted, through an
+        executor sized to the channel's concurrency. Messages are handled in an
+        executor, so as not to block the event loop; unless queued in an outbox,
+        resulting sends are performed on asynchronous tasks by priority.
+        """
+        loop = asyncio.get_running_loop()
+        workers = self.channel.backend.concurrency
+        executor = None
+        if not backend:
+            executor = concurrent.futures.ThreadPoolExecutor(workers + 1)  # receive
+            backend = vokiz.backends.AsyncAdapter(self.backend, executor)
+        source = vokiz.journal.source(self.channel.backend)
+        scheduler = None
+        if not self.outbox:
+            send = functools.partial(self._transmit_async, backend)
+            scheduler = vokiz.scheduler.AsyncScheduler(send, workers)
+        drain = scheduler.wait if scheduler else None
+
+        def handle(number, message):
+            self.scheduler = scheduler
+            try:
+                with roax.context.push(context="process"):
+                    self.handle(number, message)
+            finally:
+                self.scheduler = None
+
+        try:
+            received = vokiz.journal.receive_async(
+                backend, journal, source, drain=drain
+            )
+            async for number, message in received:
+                await loop.run_in_executor(None, handle, number, message)
+        finally:
+            if scheduler:
+                await scheduler.close()
+            if executor:
+                executor.shutdown()
+
+    async def _transmit_async(self, backend, number, message):
+        """Send a message through an asynchronous backend, logging any error."""
+        self._log_send(number, message)
+        try:
+            await backend.send(number, message)
+        except BackendError as error:
+            self._log_error(number, error)
 
     # ---- user commands -----
 
@@ -315,6 +566,7 @@ class Processor:
         if phone.mute:
             raise Error(f"Channel is already muted. Use /unmute to unmute.")
         phone.mute = True
+        self._invalidate()
         self.notify(f"muted channel on {phone.number}")
         return f"Channel muted on {phone.number}. Use /unmute to unmute."
 
@@ -325,6 +577,7 @@ class Processor:
         if not phone.mute:
             raise Error(f"Channel is not muted.")
         phone.mute = False
+        self._invalidate()
         self.notify(f"unmuted channel on {phone.number}")
         return f"Channel unmuted on {phone.number}."
 
@@ -390,8 +643,53 @@ class Processor:
             user = vokiz.resource.User(nick)
             self.users.add(user)
         self.phones.add(vokiz.resource.Phone(number, user.nick))
+        self._invalidate()
         self.notify(f"added {number} ({user.nick})")
 
+    _e164 = vs.e164()
+    _nick = vs.nick()
+
+    def add_members(self, members, partial=False):
+        """
+        Add (number, nick) members to channel in bulk, returning (added numbers,
+        errors). Unless partial, no members are added if any are invalid. Operators
+        are sent a single digest notification.
+        """
+        aliases = {a.lower() for a in _dict_dataclass(self.channel.aliases).values()}
+        valid = []
+        errors = []
+        numbers = set()
+        for number, nick in members:
+            try:
+                self._e164.validate(number)
+            except s.SchemaError:
+                errors.append(f"Invalid number: {number}.")
+                continue
+            try:
+                self._nick.validate(nick)
+            except s.SchemaError:
+                errors.append(f"Invalid nick: {nick}.")
+                continue
+            if number in numbers or number in self.phones:
+                errors.append(f"{number} is already registered.")
+            elif nick.lower() in aliases:
+                errors.append(f"Nick unavailable: {nick}.")
+            else:
+                numbers.add(number)
+                valid.append((number, nick))
+        if errors and not partial:
+            return [], errors
+        for number, nick in valid:
+            user = self.users.get(nick)
+            if user is None:
+                user = vokiz.resource.User(nick)
+                self.users.add(user)
+            self.phones.add(vokiz.resource.Phone(number, user.nick))
+        if valid:
+            self._invalidate()
+            self.notify(f"imported {len(valid)} member(s)")
+        return [number for number, nick in valid], errors
+
     @cmd(auth.op)
     def remove(self, number: vs.e164()):
         """Remove member from channel."""
@@ -403,6 +701,7 @@ class Processor:
         user = self.users.get(phone.nick)
         if user and not [p for p in self.phones.values() if p.nick == phone.nick]:
             del self.users[user.nick]  # delete orphan user
+        self._invalidate()
         nick_msg = f" ({user.nick})" if user else ""
         self.notify(f"removed {number}{nick_msg}")
 
@@ -422,6 +721,7 @@ class Processor:
         if user.op:
             raise Error(f"User {user.nick} is already channel operator.")
         user.op = True
+        self._invalidate()
         self.notify(f"promoted {user.nick} to channel operator")
 
     @cmd(auth.op)
@@ -435,6 +735,7 @@ class Processor:
             raise Error(f"User {user.nick} is not channel operator.")
         self.notify(f"demoted {user.nick} to channel user")
         user.op = False
+        self._invalidate()
 
     @cmd(auth.op)
     def alias(self, **kwargs):
@@ -449,6 +750,7 @@ class Processor:
                     f"User already has nick assigned: {self.users[value].nick}."
                 )
             setattr(self.channel.aliases, key, value)
+            self._invalidate()
         self.notify(f"set alias: {_str_dict(kwargs)}")
 
     @cmd(auth.op)
@@ -484,9 +786,11 @@ class Processor:
             kwargs = _str_dict(data.kwargs)
             return f"Backend: {data.module}{' ' if kwargs else ''}{kwargs}."
         else:
-            data = vokiz.resource.Backend(module, kwargs)
+            data = dataclasses.replace(
+                self.channel.backend, module=module, kwargs=kwargs
+            )
             try:
-                self.backend = vokiz.backends.load(data)
+                self.backend = self._load_backend(data)
             except BackendError as be:
                 raise Error(f"{be}.")
             self.channel.backend = data
@@ -0,0 +1,121 @@
+"""Vokiz outbound rate limiting module."""
+
+import collections
+import threading
+import time
+import vokiz.log
+import vokiz.metrics
+
+_wait_seconds = vokiz.metrics.histogram(
+    "vokiz_ratelimit_wait_seconds",
+    "Time sends waited for a rate limit token.",
+    ["scope", "backend"],
+)
+
+
+class Bucket:
+    """
+    Token bucket shared by channels. Tokens are granted to waiting channels in
+    round-robin order, so that a busy channel cannot starve others.
+    """
+
+    def __init__(self, rate, burst=1, scope="", backend=""):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.labels = {"scope": scope, "backend": backend}
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.waiting = collections.OrderedDict()  # channel: deque of tickets
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, channel):
+        """Block until a token is granted to the channel; return seconds waited."""
+        start = time.monotonic()
+        ticket = object()
+        with self.condition:
+            self.waiting.setdefault(channel, collections.deque()).append(ticket)
+            while True:
+                first = next(iter(self.waiting))
+                if first != channel or self.waiting[channel][0] is not ticket:
+                    self.condition.wait()
+                    continue
+                self._refill()
+                if self.tokens >= 1:
+                    break
+                self.condition.wait((1 - self.tokens) / self.rate)
+            self.tokens -= 1
+            tickets = self.waiting.pop(channel)
+            tickets.popleft()
+            if tickets:  # channel waits again behind other channels
+                self.waiting[channel] = tickets
+            self.condition.notify_all()
+        waited = time.monotonic() - start
+        _wait_seconds.observe(waited, **self.labels)
+        return waited
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def bucket(key, rate, burst=1):
+    """
+    Return the bucket shared by all backends with the same (scope, module, id) key.
+    The bucket keeps the limits it was created with; conflicting limits are logged.
+    """
+    with _lock:
+        result = _buckets.get(key)
+        if result is None:
+            result = Bucket(rate, burst, scope=key[0], backend=key[1])
+            _buckets[key] = result
+        elif (result.rate, result.burst) != (rate, burst):
+            text = (
+                f"Conflicting rate limit for {' '.join(key)}: {rate}/s burst {burst}; "
+                f"using {result.rate}/s burst {result.burst}."
+            )
+            vokiz.log.error("ratelimit", text, key=list(key))
+        return result
+
+
+class Limited:
+    """Backend wrapper that paces sends through token buckets."""
+
+    def __init__(self, backend, buckets, channel):
+        self.backend = backend
+        self.buckets = buckets
+        self.channel = channel
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def receive(self):
+        """Receive incoming text messages through the wrapped backend."""
+        return self.backend.receive()
+
+    def send(self, number, message):
+        """Send outgoing text message once permitted by all buckets."""
+        for b in self.buckets:
+            b.acquire(self.channel)
+        return self.backend.send(number, message)
+
+
+def limit(backend, config, channel):
+    """
+    Return backend wrapped to enforce the rate limits of its configuration: one
+    bucket per DID and one per account, shared across channels. If no limits are
+    configured, the backend is returned unwrapped.
+    """
+    buckets = []
+    module, kwargs = config.module, config.kwargs
+    if config.rate:
+        key = ("did", module, kwargs.get("did", ""))
+        buckets.append(bucket(key, config.rate, config.burst))
+    if config.account_rate:
+        key = ("account", module, kwargs.get("username", ""))
+        buckets.append(bucket(key, config.account_rate, config.burst))
+    return Limited(backend, buckets, channel) if buckets else backend
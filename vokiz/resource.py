@@ -1,44 +1,216 @@
 """Module to manage Vokiz resources."""
 
 import click
+import collections
+import dataclasses
+import json
+import os
 import os.path
 import re
 import roax.file
+import roax.resource
 import roax.schema as s
+import stat
+import tempfile
+import threading
 import vokiz.config
+import vokiz.metrics
 import vokiz.schema as vs
 
 from dataclasses import dataclass, field
 
+def _touch(obj):
+    """Mark object and the objects that contain it as changed."""
+    while obj is not None and not getattr(obj, "_changed", True):
+        object.__setattr__(obj, "_changed", True)  # containers of changed are too
+        obj = getattr(obj, "_parent", None)
+
+
+def _adopt(owner, value):
+    """Link value, or the items of a tracked list value, to the object holding it."""
+    if isinstance(value, _Tracked):
+        object.__setattr__(value, "_parent", owner)
+    elif isinstance(value, _TrackedList):
+        value._parent = owner
+        for item in value:
+            if isinstance(item, _Tracked):
+                object.__setattr__(item, "_parent", owner)
+
+
+def renames(sequence):
+    """
+    Return the count of changes to key fields of records held by the object that
+    holds a tracked list; 0 if the list is not held by one.
+    """
+    owner = getattr(sequence, "_parent", None)
+    return owner._renames if owner is not None else 0
+
+
+def _mutator(name, adds=None):
+    """Return list method that records mutation; adds is the argument of new items."""
+    method = getattr(list, name)
+
+    def mutate(self, *args, **kwargs):
+        if adds is not None:
+            args = list(args)
+            many = adds == "many" or (adds == "slice" and isinstance(args[0], slice))
+            if many:
+                args[-1] = list(args[-1])
+            for item in args[-1] if many else args[-1:]:
+                if isinstance(item, _Tracked):
+                    object.__setattr__(item, "_parent", self._parent)
+        self.changed = True
+        _touch(self._parent)
+        return method(self, *args, **kwargs)
+
+    return mutate
+
+
+class _TrackedList(list):
+    """
+    List that records whether it has been mutated. Mutation, and changes to items it
+    holds, are also recorded by the object that holds the list.
+    """
+
+    changed = False
+    _parent = None
+
+    __setitem__ = _mutator("__setitem__", "slice")
+    __delitem__ = _mutator("__delitem__")
+    __iadd__ = _mutator("__iadd__", "many")
+    __imul__ = _mutator("__imul__")
+    append = _mutator("append", "one")
+    extend = _mutator("extend", "many")
+    insert = _mutator("insert", "one")
+    pop = _mutator("pop")
+    remove = _mutator("remove")
+    clear = _mutator("clear")
+    sort = _mutator("sort")
+    reverse = _mutator("reverse")
+
+
+class _Tracked:
+    """
+    Dataclass mixin that records whether fields have been changed. Changes are
+    propagated to the object that holds this one, so changed is constant time.
+    """
+
+    __slots__ = ("_changed", "_parent")
+
+    _keys = ()  # fields identifying records; changes are counted by the holder
+    _renames = 0  # changes to key fields of records held by this object
+
+    def __new__(cls, *args, **kwargs):
+        result = object.__new__(cls)
+        object.__setattr__(result, "_changed", True)
+        object.__setattr__(result, "_parent", None)
+        return result
+
+    def __setattr__(self, name, value):
+        if type(value) is list:
+            value = _TrackedList(value)
+        if isinstance(value, (_Tracked, _TrackedList)):
+            _adopt(self, value)
+        object.__setattr__(self, name, value)  # faster than super() per field
+        if name in self._keys and self._parent is not None:
+            parent = self._parent
+            object.__setattr__(parent, "_renames", parent._renames + 1)
+        if not self._changed:
+            _touch(self)
+
+    @property
+    def changed(self):
+        """Whether this object or any object it contains changed since clean."""
+        return getattr(self, "_changed", True)
+
+    def _values(self):
+        return [getattr(self, name) for name in self.__dataclass_fields__]
+
+    def copy(self):
+        """Return a deep copy of this object, including its change state."""
+        result = type(self).__new__(type(self))
+        for name in self.__dataclass_fields__:
+            value = getattr(self, name)
+            if isinstance(value, _Tracked):
+                value = value.copy()
+            elif isinstance(value, list):
+                items = [i.copy() if isinstance(i, _Tracked) else i for i in value]
+                changed = getattr(value, "changed", True)
+                value = _TrackedList(items)
+                value.changed = changed
+            elif isinstance(value, dict):
+                value = dict(value)
+            _adopt(result, value)
+            object.__setattr__(result, name, value)
+        object.__setattr__(result, "_changed", getattr(self, "_changed", True))
+        return result
+
+    def clean(self):
+        """Mark this object and all objects it contains as unchanged."""
+        object.__setattr__(self, "_changed", False)
+        for value in self._values():
+            if isinstance(value, _Tracked):
+                value.clean()
+            elif isinstance(value, _TrackedList):
+                value.changed = False
+                for item in value:
+                    if isinstance(item, _Tracked):
+                        item.clean()
+
+
+def _slotted(cls):
+    """
+    Return dataclass recreated with slots for its fields. Membership records are held
+    in large numbers, so are stored without a per-instance __dict__.
+    """
+    names = tuple(f.name for f in dataclasses.fields(cls))
+    body = {k: v for k, v in cls.__dict__.items() if k not in names}
+    body.pop("__dict__", None)
+    body.pop("__weakref__", None)
+    body["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, body)
+
 
 @dataclass
-class Backend:
+class Backend(_Tracked):
     """A backend to send/receive channel messages."""
 
     module: s.str() = "none"
     kwargs: s.dict({}, additional=s.str()) = field(default_factory=dict)
+    concurrency: s.int(minimum=1) = 1
+    rate: s.float(minimum=0) = 0.0  # sends per second per DID; 0 is unlimited
+    account_rate: s.float(minimum=0) = 0.0  # sends per second per account
+    burst: s.int(minimum=1) = 1
+    transliterate: s.bool() = False  # replace characters that force UCS-2
+    trim_head: s.bool() = False  # shorten or drop header if it adds a segment
 
 
+@_slotted
 @dataclass
-class Phone:
+class Phone(_Tracked):
     """A phone number associated with a channel."""
 
+    _keys = ("number",)
+
     number: vs.e164()
     nick: vs.nick()
     mute: s.bool() = False
 
 
+@_slotted
 @dataclass
-class User:
+class User(_Tracked):
     """A user associated with a channel."""
 
+    _keys = ("nick",)
+
     nick: vs.nick()
     voice: s.bool() = True
     op: s.bool() = False
 
 
 @dataclass
-class Aliases:
+class Aliases(_Tracked):
     """Aliases for group distributions."""
 
     ops: vs.nick() = "ops"
@@ -46,7 +218,7 @@ class Aliases:
 
 
 @dataclass
-class Channel:
+class Channel(_Tracked):
     """A channel of communications."""
 
     id: s.str()
@@ -59,23 +231,129 @@ class Channel:
 
 
 _schema = s.dataclass(Channel)
+_backend_schema = s.dataclass(Backend)
+
+_channel_seconds = vokiz.metrics.histogram(
+    "vokiz_channel_seconds",
+    "Time to load or save a channel.",
+    ["storage", "operation"],
+)
 
 
 class Channels(roax.file.FileResource):
-    """Vokiz channels resource."""
+    """
+    Vokiz channels resource. Decoded channels are cached, validated by the identity,
+    modification time and size of their files; callers receive copies. If SQLite
+    storage is specified or configured, a SQLite channels resource is created
+    instead.
+    """
 
     schema = _schema
     extension = ".json"
 
-    def __init__(self):
+    def __new__(cls, storage=None):
+        config = vokiz.config.config
+        if (storage or config.storage) == "sqlite":
+            from vokiz.sqlite import Channels as SQLiteChannels  # imports this module
+
+            return SQLiteChannels(config.database)
+        return super().__new__(cls)
+
+    def __init__(self, storage=None):
         self.dir = vokiz.config.config.channel_dir
+        self.cache_size = vokiz.config.config.channel_cache
+        self._cache = collections.OrderedDict()  # id: (stat key, channel)
+        self._cache_lock = threading.Lock()
         super().__init__()
 
+    def _path(self, id):
+        return os.path.join(self.dir, f"{id}{self.extension}")
+
+    def _stat(self, id):
+        """Return key identifying the current version of a channel file."""
+        try:
+            st = os.stat(self._path(id))
+        except FileNotFoundError:
+            raise roax.resource.NotFound
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _cached(self, id, key):
+        with self._cache_lock:
+            entry = self._cache.get(id)
+            if entry and entry[0] == key:
+                self._cache.move_to_end(id)
+                return entry[1].copy()
+
+    def _store(self, id, key, channel):
+        if not self.cache_size:
+            return
+        channel = channel.copy()
+        with self._cache_lock:
+            self._cache[id] = (key, channel)
+            self._cache.move_to_end(id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _evict(self, id):
+        with self._cache_lock:
+            self._cache.pop(id, None)
+
+    @_channel_seconds.time(storage="file", operation="read")
     def read(self, id):
         """Read a channel resource item."""
-        result = super().read(id)
-        result.id = id
+        key = self._stat(id)
+        result = self._cached(id, key)
+        if result is None:
+            result = super().read(id)
+            result.id = id
+            result.clean()
+            self._store(id, key, result)
         return result
 
+    def backend(self, id):
+        """Read the backend configuration of a channel, without decoding members."""
+        key = self._stat(id)
+        cached = self._cached(id, key)
+        if cached is not None:
+            return cached.backend
+        with open(self._path(id)) as file:
+            return _backend_schema.json_decode(json.load(file).get("backend", {}))
+
+    @_channel_seconds.time(storage="file", operation="update")
+    def update(self, id, _body):
+        """Update a channel resource item, atomically replacing its file."""
+        self.schema.validate(_body)
+        path = self._path(id)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            raise roax.resource.NotFound
+        fd, temp = tempfile.mkstemp(dir=self.dir, prefix=f".{id}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(self.schema.json_encode(_body), file)
+                file.flush()
+                os.fsync(file.fileno())
+                st = os.fstat(file.fileno())  # identifies file once replaced
+            os.chmod(temp, mode)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+        _body.clean()
+        self._store(id, (st.st_ino, st.st_mtime_ns, st.st_size), _body)
+
+    def delete(self, id):
+        """Delete a channel resource item."""
+        self._evict(id)
+        super().delete(id)
+
+    def mtime(self, id):
+        """Return modification time of a channel resource item, in nanoseconds."""
+        try:
+            return os.stat(self._path(id)).st_mtime_ns
+        except FileNotFoundError:
+            raise roax.resource.NotFound
+
 
 resources = roax.resource.Resources({"channels": "vokiz.resource:Channels"})
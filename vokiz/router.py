@@ -0,0 +1,151 @@
+"""Vokiz inbound message routing module."""
+
+import asyncio
+import concurrent.futures
+import functools
+import roax.context
+import roax.resource
+import vokiz.backends
+import vokiz.journal
+import vokiz.log
+import vokiz.scheduler
+
+
+class Router:
+    """
+    Routes inbound messages to channels. Channels with the same backend account and
+    number share a single receive; each message is dispatched to the channel
+    in which the sender's number is registered.
+    """
+
+    def __init__(self, processors, journal=None):
+        self.processors = processors
+        self.journal = journal
+        self._numbers = {}  # id: (mtime, numbers)
+
+    def groups(self, ids):
+        """Return lists of channel identifiers, grouped by backend account and number."""
+        result = {}
+        for id in ids:
+            try:
+                backend = self.processors.get(id).channel.backend
+            except roax.resource.NotFound:
+                self.processors.discard(id)
+                continue
+            except Exception as e:  # others are still grouped
+                text = f"Error loading channel: {id}: {e}."
+                vokiz.log.error("process", text, channel=id)
+                self.processors.discard(id)
+                continue
+            result.setdefault(vokiz.backends.key(backend), []).append(id)
+        return list(result.values())
+
+    def _registered(self, id):
+        """Return set of numbers registered in channel."""
+        processor = self.processors.get(id)
+        mtime = self.processors.mtime(id)
+        entry = self._numbers.get(id)
+        if not entry or entry[0] != mtime:
+            entry = (mtime, frozenset(processor.phones))
+            self._numbers[id] = entry
+        return entry[1]
+
+    def route(self, ids, number):
+        """Return first channel in ids in which number is registered, or None."""
+        for id in ids:
+            if number in self._registered(id):
+                return id
+
+    def _dispatch(self, group, number, message, schedulers, scheduler):
+        """
+        Handle message in the channel of group in which the sender is registered.
+        Unless queued in an outbox, sends are queued in the channel's scheduler,
+        created by calling scheduler with the processor if not in schedulers.
+        """
+        id = group[0] if len(group) == 1 else self.route(group, number)
+        if id is None:  # ignore messages from unregistered numbers
+            vokiz.log.event("receive", f"{number}: {message}", number=number)
+            return
+        with self.processors.open(id) as processor:
+            if not processor.outbox and id not in schedulers:
+                schedulers[id] = scheduler(processor)
+            processor.scheduler = schedulers.get(id)
+            try:
+                with roax.context.push(context="process"):
+                    processor.handle(number, message)
+            finally:
+                processor.scheduler = None
+
+    def receive(self, group):
+        """
+        Receive messages once for group of channels, dispatching each message. Unless
+        queued in an outbox, resulting sends are scheduled by priority for each
+        channel; messages are only acknowledged once their resulting sends are made.
+        """
+        schedulers = {}
+
+        def drain():
+            for s in list(schedulers.values()):
+                s.wait()
+
+        processor = self.processors.get(group[0])
+        source = vokiz.journal.source(processor.channel.backend)
+        received = vokiz.journal.receive(
+            processor.backend, self.journal, source, drain=drain
+        )
+
+        def scheduler(processor):
+            workers = processor.channel.backend.concurrency
+            return vokiz.scheduler.Scheduler(processor._transmit, workers)
+
+        try:
+            for number, message in received:
+                self._dispatch(group, number, message, schedulers, scheduler)
+        finally:
+            for s in schedulers.values():
+                s.close()
+
+    async def receive_async(self, group):
+        """
+        Asynchronous counterpart of receive. Channel backends are adapted to the
+        asynchronous backend protocol, and resulting sends are performed on
+        asynchronous tasks by priority for each channel, each through an executor
+        sized to the channel's concurrency. Messages are dispatched in an executor,
+        so routing, handling and channel persistence do not block the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        schedulers = {}
+        executors = []
+
+        async def drain():
+            for s in list(schedulers.values()):
+                await s.wait()
+
+        processor = await loop.run_in_executor(None, self.processors.get, group[0])
+        source = vokiz.journal.source(processor.channel.backend)
+        backend = vokiz.backends.AsyncAdapter(processor.backend)
+        received = vokiz.journal.receive_async(
+            backend, self.journal, source, drain=drain
+        )
+
+        async def create(processor):
+            workers = processor.channel.backend.concurrency
+            executor = concurrent.futures.ThreadPoolExecutor(workers)
+            executors.append(executor)
+            backend = vokiz.backends.AsyncAdapter(processor.backend, executor)
+            send = functools.partial(processor._transmit_async, backend)
+            return vokiz.scheduler.AsyncScheduler(send, workers)
+
+        def scheduler(processor):  # called in the dispatch executor
+            return asyncio.run_coroutine_threadsafe(create(processor), loop).result()
+
+        try:
+            async for number, message in received:
+                await loop.run_in_executor(
+                    None, self._dispatch, group, number, message, schedulers, scheduler
+                )
+        finally:
+            for s in schedulers.values():
+                await s.close()
+            for executor in executors:
+                executor.shutdown()
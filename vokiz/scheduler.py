@@ -0,0 +1,165 @@
+"""Vokiz outbound message scheduling module."""
+
+import asyncio
+import collections
+import threading
+import vokiz.log
+
+# priority classes, highest first
+REPLY = 0  # response to a command
+NOTIFY = 1  # notification to operators
+ADDRESSED = 2  # message addressed to a user or alias
+BROADCAST = 3  # message to all members
+
+PRIORITIES = (REPLY, NOTIFY, ADDRESSED, BROADCAST)
+
+
+class Lanes:
+    """
+    Queue of items in priority lanes. Items are taken from the highest priority lane
+    that holds items, except that a lane passed over starvation times in favour of
+    higher lanes is served next, so every lane makes progress.
+    """
+
+    def __init__(self, starvation=8):
+        self.starvation = starvation
+        self._lanes = [collections.deque() for _ in PRIORITIES]
+        self._passed = [0 for _ in PRIORITIES]
+
+    def __len__(self):
+        return sum(len(lane) for lane in self._lanes)
+
+    def put(self, priority, item):
+        """Add item to the lane of its priority."""
+        self._lanes[priority].append(item)
+
+    def get(self):
+        """Remove and return the next item, raising IndexError if none are queued."""
+        waiting = [p for p in PRIORITIES if self._lanes[p]]
+        if not waiting:
+            raise IndexError("no queued items")
+        starved = [p for p in waiting if self._passed[p] >= self.starvation]
+        priority = starved[0] if starved else waiting[0]
+        for p in waiting:
+            self._passed[p] = 0 if p == priority else self._passed[p] + (p > priority)
+        return self._lanes[priority].popleft()
+
+
+class Scheduler:
+    """
+    Sends queued messages on worker threads, highest priority first. Messages are
+    sent by calling send with their number and message.
+    """
+
+    def __init__(self, send, workers=1, starvation=8):
+        self.send = send
+        self._lanes = Lanes(starvation)
+        lock = threading.Lock()
+        self._condition = threading.Condition(lock)  # items queued or closed
+        self._idle = threading.Condition(lock)  # items sent
+        self._active = 0  # items being sent
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name="sender", daemon=True)
+            for _ in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, priority, number, message):
+        """Queue a message to be sent."""
+        with self._condition:
+            self._lanes.put(priority, (number, message))
+            self._condition.notify()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._lanes and not self._closed:
+                    self._condition.wait()
+                if not self._lanes:
+                    return
+                item = self._lanes.get()
+                self._active += 1
+            try:
+                self.send(*item)
+            except Exception as e:
+                vokiz.log.error("send", f"Error sending to {item[0]}: {e}.")
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._idle.notify_all()
+
+    def wait(self):
+        """Block until all queued messages have been sent."""
+        with self._condition:
+            while self._lanes or self._active:
+                self._idle.wait()
+
+    def close(self):
+        """Send all queued messages, then stop the workers."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class AsyncScheduler:
+    """
+    Sends queued messages on asynchronous tasks, highest priority first. Messages
+    are sent by awaiting send with their number and message. Must be created in
+    the event loop; messages can be queued from other threads.
+    """
+
+    def __init__(self, send, workers=1, starvation=8):
+        self.send = send
+        self._loop = asyncio.get_running_loop()
+        self._lanes = Lanes(starvation)
+        self._ready = asyncio.Event()  # items queued or closed
+        self._idle = asyncio.Event()  # items sent
+        self._active = 0  # items being sent
+        self._closed = False
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(workers)]
+
+    def put(self, priority, number, message):
+        """Queue a message to be sent."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # not in an event loop thread
+            loop = None
+        if loop is not self._loop:
+            self._loop.call_soon_threadsafe(self.put, priority, number, message)
+            return
+        self._lanes.put(priority, (number, message))
+        self._ready.set()
+
+    async def _work(self):
+        while True:
+            if self._lanes:
+                item = self._lanes.get()
+                self._active += 1
+                try:
+                    await self.send(*item)
+                except Exception as e:
+                    vokiz.log.error("send", f"Error sending to {item[0]}: {e}.")
+                finally:
+                    self._active -= 1
+                    self._idle.set()
+            elif self._closed:
+                return
+            else:
+                self._ready.clear()
+                await self._ready.wait()
+
+    async def wait(self):
+        """Wait until all queued messages have been sent."""
+        while self._lanes or self._active:
+            self._idle.clear()
+            await self._idle.wait()
+
+    async def close(self):
+        """Send all queued messages, then stop the workers."""
+        self._closed = True
+        self._ready.set()
+        await asyncio.gather(*self._tasks)
@@ -0,0 +1,115 @@
+"""Vokiz SMS segment encoding module."""
+
+import unicodedata
+
+from dataclasses import dataclass
+
+_gsm = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?¡ABCDEFGHIJKLMN"
+    "OPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+
+_extended = set("\f^{}\\[~]|€")  # escaped; two septets each
+
+_transliterations = {
+    "\u00a0": " ",  # no-break space
+    "\t": " ",
+    "‘": "'",
+    "’": "'",
+    "‚": "'",
+    "′": "'",
+    "`": "'",
+    "“": '"',
+    "”": '"',
+    "„": '"',
+    "″": '"',
+    "«": '"',
+    "»": '"',
+    "‐": "-",
+    "\u2011": "-",  # non-breaking hyphen
+    "–": "-",
+    "—": "-",
+    "\u2212": "-",  # minus sign
+    "…": "...",
+    "•": "*",
+    "©": "(c)",
+    "®": "(R)",
+    "™": "TM",
+}
+
+_limits = {  # charset: (units in single segment, units per segment of multiple)
+    "GSM-7": (160, 153),
+    "UCS-2": (70, 67),
+}
+
+
+@dataclass
+class Segments:
+    """Encoding of a text message in SMS segments."""
+
+    charset: str
+    units: int  # septets for GSM-7, 16-bit code units for UCS-2
+    count: int
+
+
+def _septets(c):
+    if c in _gsm:
+        return 1
+    if c in _extended:
+        return 2
+    return None
+
+
+def _units(text):
+    """Return (charset, list of units per character) of text."""
+    septets = [_septets(c) for c in text]
+    if None not in septets:
+        return "GSM-7", septets
+    return "UCS-2", [len(c.encode("utf-16-le")) // 2 for c in text]
+
+
+def segments(text):
+    """Return the segments needed to send text as SMS."""
+    charset, units = _units(text)
+    single, multiple = _limits[charset]
+    total = sum(units)
+    if total <= single:
+        return Segments(charset, total, 1 if total else 0)
+    count, used = 1, 0
+    for u in units:  # escape sequences and surrogate pairs are not split
+        if used + u > multiple:
+            count += 1
+            used = 0
+        used += u
+    return Segments(charset, total, count)
+
+
+def transliterate(text):
+    """Replace characters that require UCS-2 with GSM-7 equivalents, where known."""
+    result = []
+    for c in text:
+        if _septets(c) is None:
+            replacement = _transliterations.get(c)
+            if replacement is None:
+                decomposed = unicodedata.normalize("NFKD", c)
+                stripped = "".join(
+                    d for d in decomposed if not unicodedata.combining(d)
+                )
+                if stripped and None not in map(_septets, stripped):
+                    replacement = stripped
+            c = replacement or c
+        result.append(c)
+    return "".join(result)
+
+
+def compose(message, headers):
+    """
+    Return text of message prefixed with the first of headers that does not add a
+    segment to the message alone, or with the last header if all do.
+    """
+    body = segments(message).count
+    for header in headers:
+        text = f"{header}{message}"
+        if segments(text).count <= body:
+            break
+    return text
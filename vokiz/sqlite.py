@@ -0,0 +1,239 @@
+"""Module to store Vokiz channels in an SQLite database."""
+
+import json
+import os.path
+import roax.resource
+import sqlite3
+import threading
+import time
+
+from vokiz.resource import (
+    _backend_schema,
+    _channel_seconds,
+    _schema,
+    Aliases,
+    Channel,
+    Phone,
+    User,
+)
+
+_ddl = """
+CREATE TABLE IF NOT EXISTS channels (
+    id TEXT PRIMARY KEY,
+    head TEXT NOT NULL,
+    rcpt TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    modified INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    channel TEXT NOT NULL REFERENCES channels (id) ON DELETE CASCADE,
+    nick TEXT NOT NULL COLLATE NOCASE,
+    voice INTEGER NOT NULL,
+    op INTEGER NOT NULL,
+    PRIMARY KEY (channel, nick)
+);
+CREATE TABLE IF NOT EXISTS phones (
+    channel TEXT NOT NULL REFERENCES channels (id) ON DELETE CASCADE,
+    number TEXT NOT NULL,
+    nick TEXT NOT NULL COLLATE NOCASE,
+    mute INTEGER NOT NULL,
+    PRIMARY KEY (channel, number)
+);
+CREATE INDEX IF NOT EXISTS phones_number ON phones (number);
+CREATE INDEX IF NOT EXISTS phones_nick ON phones (channel, nick);
+CREATE TABLE IF NOT EXISTS aliases (
+    channel TEXT NOT NULL REFERENCES channels (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    nick TEXT NOT NULL,
+    PRIMARY KEY (channel, name)
+);
+"""
+
+_tables = {  # table: (key, columns)
+    "users": ("nick", ("nick", "voice", "op")),
+    "phones": ("number", ("number", "nick", "mute")),
+}
+
+
+class Database:
+    """SQLite database file, with a connection for each thread that uses it."""
+
+    def __init__(self, file, foreign_keys=False):
+        self.file = file
+        self.foreign_keys = foreign_keys
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+
+    @property
+    def connection(self):
+        """Connection to the database for the current thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.file)
+            if self.foreign_keys:
+                connection.execute("PRAGMA foreign_keys = ON")
+            connection.execute("PRAGMA journal_mode = WAL")
+            self._local.connection = connection
+        return connection
+
+
+class Channels(roax.resource.Resource):
+    """Vokiz channels resource, stored in an SQLite database."""
+
+    schema = _schema
+
+    def __init__(self, database):
+        super().__init__()
+        self.database = database
+        self._db = Database(database, foreign_keys=True)
+        self._db.connection.executescript(_ddl)
+
+    def _write_channel(self, c, id, channel, create=False):
+        """Write channel row, returning number of rows written."""
+        backend = json.dumps(_backend_schema.json_encode(channel.backend))
+        row = (channel.head, channel.rcpt, backend, time.time_ns(), id)
+        if create:
+            sql = "INSERT INTO channels (head, rcpt, backend, modified, id) VALUES "
+            sql += "(?, ?, ?, ?, ?)"
+        else:
+            sql = "UPDATE channels SET head = ?, rcpt = ?, backend = ?, modified = ? "
+            sql += "WHERE id = ?"
+        return c.execute(sql, row).rowcount
+
+    def _write_aliases(self, c, id, aliases):
+        c.executemany(
+            "INSERT INTO aliases VALUES (?, ?, ?) "
+            "ON CONFLICT (channel, name) DO UPDATE SET nick = excluded.nick",
+            [(id, name, getattr(aliases, name)) for name in Aliases.__annotations__],
+        )
+
+    def _write_rows(self, c, id, table, items, full=False):
+        """Write rows of items that changed, removing rows of items no longer held."""
+        key, columns = _tables[table]
+        changed = [i for i in items if full or i.changed]
+        if not full and (changed or getattr(items, "changed", True)):
+            current = {getattr(i, key).lower() for i in items}
+            stale = [
+                (id, k)
+                for (k,) in c.execute(
+                    f"SELECT {key} FROM {table} WHERE channel = ?", (id,)
+                )
+                if k.lower() not in current
+            ]
+            c.executemany(f"DELETE FROM {table} WHERE channel = ? AND {key} = ?", stale)
+        values = ", ".join(["?"] * (len(columns) + 1))
+        updates = ", ".join(f"{col} = excluded.{col}" for col in columns)
+        c.executemany(
+            f"INSERT INTO {table} VALUES ({values}) "
+            f"ON CONFLICT (channel, {key}) DO UPDATE SET {updates}",
+            [(id, *[getattr(i, col) for col in columns]) for i in changed],
+        )
+
+    def create(self, id, _body):
+        """Create a channel resource item."""
+        self.schema.validate(_body)
+        try:
+            with self._db.connection as c:
+                self._write_channel(c, id, _body, create=True)
+                self._write_aliases(c, id, _body.aliases)
+                for table in _tables:
+                    self._write_rows(c, id, table, getattr(_body, table), full=True)
+        except sqlite3.IntegrityError:
+            raise roax.resource.Conflict
+        _body.clean()
+        return {"id": id}
+
+    @_channel_seconds.time(storage="sqlite", operation="read")
+    def read(self, id):
+        """Read a channel resource item."""
+        c = self._db.connection
+        row = c.execute(
+            "SELECT head, rcpt, backend FROM channels WHERE id = ?", (id,)
+        ).fetchone()
+        if not row:
+            raise roax.resource.NotFound
+        head, rcpt, backend = row
+        select = "SELECT {} FROM {} WHERE channel = ? ORDER BY rowid"
+        result = Channel(
+            id=id,
+            backend=_backend_schema.json_decode(json.loads(backend)),
+            head=head,
+            users=[
+                User(nick, bool(voice), bool(op))
+                for nick, voice, op in c.execute(
+                    select.format("nick, voice, op", "users"), (id,)
+                )
+            ],
+            phones=[
+                Phone(number, nick, bool(mute))
+                for number, nick, mute in c.execute(
+                    select.format("number, nick, mute", "phones"), (id,)
+                )
+            ],
+            aliases=Aliases(
+                **dict(c.execute(select.format("name, nick", "aliases"), (id,)))
+            ),
+            rcpt=rcpt,
+        )
+        result.clean()
+        return result
+
+    def backend(self, id):
+        """Read the backend configuration of a channel, without reading members."""
+        row = self._db.connection.execute(
+            "SELECT backend FROM channels WHERE id = ?", (id,)
+        ).fetchone()
+        if not row:
+            raise roax.resource.NotFound
+        return _backend_schema.json_decode(json.loads(row[0]))
+
+    @_channel_seconds.time(storage="sqlite", operation="update")
+    def update(self, id, _body):
+        """Update a channel resource item, writing only rows that changed."""
+        self.schema.validate(_body)
+        with self._db.connection as c:
+            if not self._write_channel(c, id, _body):
+                raise roax.resource.NotFound
+            self._write_aliases(c, id, _body.aliases)
+            for table in _tables:
+                self._write_rows(c, id, table, getattr(_body, table))
+        _body.clean()
+
+    def delete(self, id):
+        """Delete a channel resource item."""
+        with self._db.connection as c:
+            if not c.execute("DELETE FROM channels WHERE id = ?", (id,)).rowcount:
+                raise roax.resource.NotFound
+
+    def list(self):
+        """Return list of channel identifiers."""
+        return [id for (id,) in self._db.connection.execute("SELECT id FROM channels")]
+
+    def mtime(self, id):
+        """Return modification time of a channel resource item, in nanoseconds."""
+        row = self._db.connection.execute(
+            "SELECT modified FROM channels WHERE id = ?", (id,)
+        ).fetchone()
+        if not row:
+            raise roax.resource.NotFound
+        return row[0]
+
+
+def migrate(source, target, replace=False):
+    """
+    Copy channels from source to target channels resource, returning the identifiers
+    of channels copied. Existing channels in target are skipped unless replace is
+    true.
+    """
+    result = []
+    for id in source.list():
+        channel = source.read(id)
+        try:
+            target.create(id, channel)
+        except roax.resource.Conflict:
+            if not replace:
+                continue
+            target.delete(id)
+            target.create(id, channel)
+        result.append(id)
+    return result
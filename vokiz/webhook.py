@@ -0,0 +1,172 @@
+"""Vokiz inbound SMS webhook module."""
+
+import hmac
+import importlib
+import roax.context
+import roax.resource
+import socketserver
+import threading
+import time
+import urllib.parse
+import vokiz.config
+import vokiz.log
+import vokiz.metrics
+import vokiz.outbox
+import vokiz.router
+import vokiz.scheduler
+import wsgiref.simple_server
+
+from vokiz.backends import BackendError
+from vokiz.daemon import Processors
+from vokiz.resource import resources
+
+
+def _equal(a, b):
+    """Compare strings in constant time."""
+    return hmac.compare_digest(a.encode(), b.encode())
+
+
+class App:
+    """WSGI application that handles inbound SMS callbacks from a provider."""
+
+    def __init__(self, module="voipms", refresh=60.0):
+        try:
+            self.backend = importlib.import_module(f"vokiz.backends.{module}")
+        except ModuleNotFoundError:
+            raise BackendError(f"No such backend module: {module}")
+        if not hasattr(self.backend, "callback"):
+            raise BackendError(f"Backend {module} does not support callbacks")
+        self.module = module
+        self.refresh = refresh  # minimum seconds between index rebuilds on miss
+        self.processors = Processors(vokiz.outbox.configured())
+        self.router = vokiz.router.Router(self.processors)
+        self.dids = {}  # did: [(id, token)]
+        self.indexed = None
+        self.schedulers = {}  # id: scheduler sending messages for channel
+        self._lock = threading.Lock()
+
+    def _index(self):
+        """Rebuild DID-to-channel index from channel backend configuration."""
+        dids = {}
+        for id in resources.channels.list():
+            try:
+                backend = resources.channels.read(id).backend
+            except roax.resource.NotFound:
+                continue
+            kwargs = backend.kwargs
+            if backend.module == self.module and "did" in kwargs:
+                dids.setdefault(kwargs["did"], []).append((id, kwargs.get("token")))
+        self.dids = dids
+        self.indexed = time.monotonic()
+
+    def _channels(self, did, token):
+        """
+        Return (known, ids): whether any channel receives messages for DID, and the
+        identifiers of those whose configured token matches the callback token.
+        """
+
+        def lookup():
+            entries = self.dids.get(did, [])
+            ids = [id for id, t in entries if t and _equal(t, token)]
+            return bool(entries), ids
+
+        with self._lock:
+            known, ids = lookup()
+            stale = (
+                self.indexed is None or time.monotonic() - self.indexed > self.refresh
+            )
+            if not ids and stale:  # channel or token may be new
+                self._index()
+                known, ids = lookup()
+            return known, ids
+
+    def _scheduler(self, id, processor):
+        """Return the scheduler that sends messages for channel, creating it if none."""
+        with self._lock:
+            scheduler = self.schedulers.get(id)
+            if not scheduler:
+
+                def send(number, message):
+                    self.processors.get(id)._transmit(number, message)
+
+                workers = processor.channel.backend.concurrency
+                scheduler = vokiz.scheduler.Scheduler(send, workers)
+                self.schedulers[id] = scheduler
+            return scheduler
+
+    def close(self, ids=None):
+        """Send messages scheduled for channels, then stop their schedulers."""
+        with self._lock:
+            ids = list(self.schedulers) if ids is None else ids
+            schedulers = [self.schedulers.pop(id, None) for id in ids]
+        for scheduler in filter(None, schedulers):
+            scheduler.close()
+
+    def __call__(self, environ, start_response):
+        method = environ["REQUEST_METHOD"]
+        if environ.get("PATH_INFO") == "/metrics" and vokiz.config.config.metrics:
+            return _respond(start_response, "200 OK", vokiz.metrics.render())
+        params = dict(urllib.parse.parse_qsl(environ.get("QUERY_STRING", "")))
+        if method == "POST":
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+            body = environ["wsgi.input"].read(length).decode()
+            params.update(urllib.parse.parse_qsl(body))
+        elif method != "GET":
+            return _respond(start_response, "405 Method Not Allowed", "GET, POST")
+        try:
+            did, number, message = self.backend.callback(params)
+        except BackendError as be:
+            return _respond(start_response, "400 Bad Request", f"{be}.")
+        known, ids = self._channels(did, params.get("token", ""))
+        if not known:
+            return _respond(start_response, "404 Not Found", f"No channel for {did}.")
+        if not ids:  # reject before routing, so senders cannot be impersonated
+            return _respond(start_response, "403 Forbidden", "Invalid token.")
+        try:
+            id = ids[0] if len(ids) == 1 else self.router.route(ids, number)
+            if id is None:  # ignore messages from unregistered numbers
+                vokiz.log.event("receive", f"{number}: {message}", number=number)
+                return _respond(start_response, "200 OK", "ok")
+            with self.processors.open(id) as processor:
+                if not processor.outbox:  # send after responding, by priority
+                    processor.scheduler = self._scheduler(id, processor)
+                try:
+                    with roax.context.push(context="process"):
+                        processor.handle(number, message)
+                finally:
+                    processor.scheduler = None
+        except roax.resource.NotFound:
+            for id in ids:
+                self.processors.discard(id)
+            self.close(ids)
+            self.indexed = None  # rebuild index on next miss
+            return _respond(start_response, "404 Not Found", f"No channel for {did}.")
+        return _respond(start_response, "200 OK", "ok")
+
+
+def _respond(start_response, status, body):
+    body = body.encode()
+    headers = [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))]
+    start_response(status, headers)
+    return [body]
+
+
+class _Server(socketserver.ThreadingMixIn, wsgiref.simple_server.WSGIServer):
+    daemon_threads = True
+
+
+def serve(host, port, module="voipms"):
+    """Serve the webhook application until interrupted."""
+    app = App(module)
+    server = wsgiref.simple_server.make_server(host, port, app, server_class=_Server)
+    outbox = app.processors.outbox
+    if outbox:
+        worker = vokiz.outbox.Worker(outbox, lambda id: app.processors.get(id).backend)
+        worker.start()
+    try:
+        with server:
+            server.serve_forever()
+    finally:
+        app.close()
+        if outbox:
+            worker.stop()